@@ -1,13 +1,30 @@
+import base64
+import random
 import asyncio
+import hashlib
+import logging
+
+from time import monotonic
+from typing import Coroutine
+
+from io import BytesIO
+
+from PIL import Image
 
 from misc.mono import Mono
 from misc.lang import Lang
 from misc.redis_storage import RedisStorage
+from misc.statement import StatementSync
 
 from misc.models.roll_in import Model as RollModel
 from misc.models.client_info import Model as ClientInfoModel
 
-from misc.image import ImageProcess
+from misc.image import ImageProcess, ImageEncoder
+from misc.cache import LRUCache, SingleFlight
+from misc.executor import RenderExecutor
+
+from actions.client import Accounts
+from actions.summary import Summary
 
 from aiogram import types, exceptions
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -16,8 +33,15 @@ from dispatcher import bot
 
 from decorators import async_timer
 
+import config
+
 
 class QRImage:
+    frames: LRUCache = LRUCache(config.QR_FRAME_CACHE_SIZE)
+    flights: SingleFlight = SingleFlight()
+
+    qr_pos: tuple = (185, 380)
+    link_pos: tuple = (0, 600)
 
     def __init__(self, roll: RollModel, background: str = "monocat_auth.png") -> None:
         """
@@ -29,44 +53,107 @@ class QRImage:
         """
 
         self.roll = roll
-        self.image_back = ImageProcess(background)
-        self.image_qr = ImageProcess(roll.qr)
+        self.background = background
 
-    def _link_preview(self) -> None:
+    @property
+    def link(self) -> str:
+        """
+        Property method to retrieve the link preview text, the RollModel URL without its scheme.
+
+        Returns:
+            str: The link preview text.
+        """
+
+        return self.roll.url.split("//")[1]
+
+    def _link_preview(self, image_back: ImageProcess) -> None:
         """
         Adds a link preview text to the background image based on the RollModel URL.
+
+        Args:
+            image_back (ImageProcess): The background image to draw the link on.
         """
 
-        url = self.roll.url.split("//")[1]
-        self.image_back.add_text(
-            text=url,
-            pos=(0, 600),
+        image_back.add_text(
+            text=self.link,
+            pos=self.link_pos,
             color=(0, 0, 0),
             font="Montserrat-Regular.ttf",
             size=12,
             align="center"
         )
 
-    @property
+    def frame(self) -> Image.Image:
+        """
+        Retrieves the opaque background, converting it on a frame cache miss.
+
+        The link preview holds the login token and differs with every login, so it is drawn on each render.
+
+        Returns:
+            Image.Image: The RGB frame, shared between renders and not to be modified in place.
+        """
+
+        frame = self.frames.get(self.background)
+        if frame is None:
+            frame = ImageProcess(self.background).source.convert("RGB")
+            self.frames.set(self.background, frame)
+
+        return frame
+
+    def qr_bitmap(self) -> Image.Image:
+        """
+        Decodes the QR code to a grayscale bitmap, flattening any transparency onto white.
+
+        Returns:
+            Image.Image: The grayscale QR code.
+        """
+
+        qr = Image.open(BytesIO(base64.b64decode(self.roll.qr)))
+        if qr.mode in ("1", "L"):
+            return qr.convert("L")
+
+        qr = qr.convert("RGBA")
+        flat = Image.new("RGBA", qr.size, (255, 255, 255, 255))
+        flat.alpha_composite(qr)
+
+        return flat.convert("L")
+
     def get(self) -> bytes:
         """
         Combines the background image, QR code image, and link preview text to generate a final image.
 
+        The QR code is pasted on a copy of the cached frame and the link preview is drawn over it.
+
+        This is CPU-bound Pillow work and is meant to be run through the RenderExecutor.
+
         Returns:
             bytes: The binary representation of the final image.
         """
 
-        self.image_back.image.paste(
-            self.image_qr.image,
-            (185, 380)
-        )
-        self._link_preview()
-        return bytes(self.image_back)
+        image_back = ImageProcess(self.frame())
+        image_back.image.paste(self.qr_bitmap(), self.qr_pos)
+        self._link_preview(image_back)
+
+        image_back.encoder = ImageEncoder(config.QR_IMAGE_FORMAT)
+        return bytes(image_back)
+
+    @async_timer
+    async def result(self) -> bytes:
+        """
+        Asynchronously retrieves the final image bytes, rendering them off the event loop.
+
+        Concurrent requests for an identical image share a single render.
+
+        Returns:
+            bytes: The binary representation of the final image.
+        """
+
+        key = (self.background, self.roll.url, hashlib.sha256(self.roll.qr).hexdigest(),)
+        return await self.flights.do(key, lambda: RenderExecutor().run(self.get))
 
 
 class RollIn:
-    future_list: dict = {}
-    
+
     def __init__(self, message: types.Message) -> None:
         """
         Initializes a RollIn instance with the given Telegram message.
@@ -105,9 +192,7 @@ class RollIn:
             ClientInfoModel | None: The client information if authenticated, otherwise None.
         """
 
-        future = RollIn.future_list.get(self.message.chat.id)
-        if future:
-            future.cancel()
+        AuthPoller.cancel(self.message.chat.id)
 
         token = await RedisStorage().get(f"mono_auth_{self.message.chat.id}")
 
@@ -137,30 +222,6 @@ class RollIn:
 
         await RedisStorage().set(key, new_msg.message_id)
 
-    @staticmethod
-    async def token_check_loop(message: types.Message) -> None:
-        """
-        Performs a looped token check and handles token expiration by sending a prompt to the user.
-
-        Args:
-            message (types.Message): The message associated with the MonoBank integration.
-        """
-
-        for _ in range(15):
-            result = await CheckToken(message).process()
-            if result:
-                return
-
-        button = InlineKeyboardMarkup().add(InlineKeyboardButton(
-            await Lang.get("try_again", message), callback_data="new_token"))
-
-        await message.answer(await Lang.get("token_expired", message), reply_markup=button)
-
-        try:
-            await message.delete()
-        except exceptions.MessageToDeleteNotFound:
-            pass
-
     @staticmethod
     async def session_buttons(message: types.Message) -> InlineKeyboardMarkup:
         """
@@ -211,13 +272,13 @@ class RollIn:
             return await self.message.reply(await Lang.get("update_mono_token_error", self.message))
 
         msg = await self.message.reply_photo(
-            photo=QRImage(roll).get,
+            photo=await QRImage(roll).result(),
             caption=await Lang.get("start", self.message),
             reply_markup=await self.keyboard_create(roll),
             protect_content=True
         )
 
-        RollIn.future_list[self.message.chat.id] = asyncio.ensure_future(self.token_check_loop(msg))
+        AuthPoller.add(msg)
 
         await self.process_old_message(msg)
         return msg
@@ -245,6 +306,15 @@ class LogOut:
 
         await bot.send_chat_action(self.message.chat.id, types.ChatActions.TYPING)
 
+        Accounts.cancel_prefetch(self.message.chat.id)
+        AuthPoller.cancel(self.message.chat.id)
+        accounts = await Mono.forget_client_info(self.message.chat.id)
+        accounts += await StatementSync.forget_chat(self.message.chat.id)
+        for account in set(accounts):
+            await StatementSync.forget(account)
+
+        await Summary.forget(self.message.chat.id)
+
         storage_flush = await RedisStorage().forget(f"mono_auth_{self.message.chat.id}")
         if not storage_flush:
             return await self.message.reply(await Lang.get("unknown_error", self.message))
@@ -334,14 +404,14 @@ class CheckToken:
             bool: True if the token is successfully checked and refreshed, False otherwise.
         """
 
-        await bot.send_chat_action(self.message.chat.id, types.ChatActions.TYPING)
-
         start_token = await self.get_start_token()
         token = await Mono().check_token(start_token)
 
         if not token:
             return False
 
+        await bot.send_chat_action(self.message.chat.id, types.ChatActions.TYPING)
+
         client = await Mono().client_info(self.message, token)
         message = self.message
 
@@ -349,3 +419,201 @@ class CheckToken:
         await self._msg_action(message, client.name)
 
         return True
+
+
+class AuthPoller:
+    pending: dict = {}
+    tasks: set = set()
+
+    loop_task: asyncio.Task = None
+    wake: asyncio.Event = None
+    slots: asyncio.Semaphore = None
+
+    metrics: dict = {
+        "checks": 0,
+        "authorized": 0,
+        "expired": 0,
+        "timeouts": 0,
+        "errors": 0
+    }
+
+    @classmethod
+    def start(cls) -> None:
+        """
+        Starts the scheduler checking every pending QR login, unless it is running already.
+        """
+
+        if cls.loop_task and not cls.loop_task.done():
+            return
+
+        cls.wake = asyncio.Event()
+        cls.slots = asyncio.Semaphore(config.AUTH_POLL_CONCURRENCY)
+        cls.loop_task = asyncio.ensure_future(cls._loop())
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Stops the scheduler along with the checks in progress, dropping the pending QR logins.
+        """
+
+        for task in (cls.loop_task, *cls.tasks):
+            if task:
+                task.cancel()
+
+        cls.loop_task = None
+        cls.pending.clear()
+
+    @classmethod
+    def add(cls, message: types.Message) -> None:
+        """
+        Schedules the checks of a QR login, replacing the pending login of the chat if any.
+
+        Args:
+            message (types.Message): The message with the QR code of the login.
+        """
+
+        cls.start()
+
+        now = monotonic()
+        cls.pending[message.chat.id] = {
+            "message": message,
+            "started": now,
+            "due": now + config.AUTH_POLL_INTERVAL,
+            "interval": config.AUTH_POLL_INTERVAL,
+            "checking": False
+        }
+        cls.wake.set()
+
+    @classmethod
+    def cancel(cls, chat_id: int) -> None:
+        """
+        Stops checking the pending QR login of the chat.
+
+        Args:
+            chat_id (int): The chat of the login.
+        """
+
+        cls.pending.pop(chat_id, None)
+
+    @classmethod
+    def _spawn(cls, coroutine: Coroutine) -> None:
+        """
+        Runs a coroutine as a task kept referenced until it is done, so stop can cancel it.
+
+        Args:
+            coroutine (Coroutine): The coroutine to run.
+        """
+
+        task = asyncio.ensure_future(coroutine)
+        cls.tasks.add(task)
+        task.add_done_callback(cls.tasks.discard)
+
+    @classmethod
+    async def _loop(cls) -> None:
+        """
+        Starts the checks that are due and expires the logins that have been pending for too long,
+        then sleeps until the next check is due or a login is added.
+        """
+
+        while True:
+            now = monotonic()
+
+            for chat_id, entry in list(cls.pending.items()):
+                if entry["checking"] or entry["due"] > now:
+                    continue
+
+                if now - entry["started"] > config.AUTH_POLL_TIMEOUT:
+                    del cls.pending[chat_id]
+                    cls._spawn(cls._expire(entry["message"]))
+                    continue
+
+                entry["checking"] = True
+                cls._spawn(cls._check(chat_id, entry))
+
+            due = [entry["due"] for entry in cls.pending.values() if not entry["checking"]]
+
+            cls.wake.clear()
+            try:
+                await asyncio.wait_for(cls.wake.wait(), max(0., min(due) - monotonic()) if due else None)
+            except asyncio.TimeoutError:
+                pass
+
+    @classmethod
+    async def _check(cls, chat_id: int, entry: dict) -> None:
+        """
+        Checks a pending QR login once and schedules the next check if it is still pending.
+
+        The delay grows with every check, and the time a check held the upstream request open counts
+        towards it, so long-polled checks follow each other without an extra wait.
+
+        Args:
+            chat_id (int): The chat of the login.
+            entry (dict): The pending login.
+        """
+
+        started = monotonic()
+        authorized = False
+
+        try:
+            async with cls.slots:
+                cls.metrics["checks"] += 1
+                authorized = await asyncio.wait_for(
+                    CheckToken(entry["message"]).process(), config.AUTH_POLL_CHECK_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            cls.metrics["timeouts"] += 1
+        except Exception as e:
+            cls.metrics["errors"] += 1
+            logging.warning("Auth check failed: %s" % e)
+
+        # The login has been cancelled or replaced by a newer one in the meantime
+        if cls.pending.get(chat_id) is not entry:
+            return
+
+        if authorized:
+            cls.metrics["authorized"] += 1
+            del cls.pending[chat_id]
+            return
+
+        interval = entry["interval"]
+        entry["due"] = monotonic() + max(0., interval - (monotonic() - started)) + random.uniform(0, interval / 10)
+        entry["interval"] = min(interval * 1.5, config.AUTH_POLL_MAX_INTERVAL)
+        entry["checking"] = False
+
+        cls.wake.set()
+
+    @classmethod
+    async def _expire(cls, message: types.Message) -> None:
+        """
+        Handles an expired QR login by removing the QR code and sending a prompt to try again.
+
+        Args:
+            message (types.Message): The message with the QR code of the login.
+        """
+
+        cls.metrics["expired"] += 1
+
+        button = InlineKeyboardMarkup().add(InlineKeyboardButton(
+            await Lang.get("try_again", message), callback_data="new_token"))
+
+        await message.answer(await Lang.get("token_expired", message), reply_markup=button)
+
+        try:
+            await message.delete()
+        except exceptions.MessageToDeleteNotFound:
+            pass
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Collects the pending QR logins and the check counters of the scheduler.
+
+        Returns:
+            dict: The number of pending logins and checks in progress along with the counters.
+        """
+
+        return {
+            "pending": len(cls.pending),
+            "checking": sum(1 for entry in cls.pending.values() if entry["checking"]),
+            **cls.metrics
+        }
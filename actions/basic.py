@@ -15,7 +15,16 @@ import aiohttp
 import aiogram
 from aiogram import types
 
-from misc.mono import Mono
+from misc.mono import Mono, MonoAPI, RequestScheduler
+from misc.image import ImageCache, FontRegistry
+from misc.executor import RenderExecutor
+from misc.statement import StatementSync
+from misc.summary import SpendingSummary
+from misc.codec import Codec
+
+from actions.client import AccountImage
+from actions.auth import QRImage, AuthPoller
+from actions.webhook import StatementWebhook
 
 
 class CheckProto:
@@ -76,6 +85,26 @@ class Sys:
                 "uvloop": uvloop.__version__,
                 "ujson": ujson.__version__,
                 "pydantic": pydantic.__version__
+            },
+            "cache": {
+                "images": ImageCache.stats(),
+                "fonts": FontRegistry.stats(),
+                "cards": AccountImage.cards.stats,
+                "renders": AccountImage.renders.stats,
+                "clients": Mono.metrics
+            },
+            "render": RenderExecutor.stats(),
+            "mono": MonoAPI.stats(),
+            "mono_queue": RequestScheduler.stats(),
+            "auth_poll": AuthPoller.stats(),
+            "webhook": StatementWebhook.stats(),
+            "statements": StatementSync.metrics,
+            "summaries": SpendingSummary.metrics,
+            "codec": Codec.name,
+            "flights": {
+                "accounts": AccountImage.flights.stats,
+                "qr": QRImage.flights.stats,
+                "client_info": Mono.flights.stats
             }
         })
 
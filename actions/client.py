@@ -1,5 +1,9 @@
+import os
 import re
 import json
+import asyncio
+import hashlib
+import logging
 
 from textwrap import wrap
 
@@ -15,16 +19,21 @@ from misc.mono import Mono
 from misc.models.client_info import Model as ClientModel
 from misc.models.client_info import Account as AccountModel
 
-from misc.image import ImageProcess
+from misc.image import ImageProcess, ImageCache, ImageEncoder
+from misc.executor import RenderExecutor
 from misc.redis_storage import RedisStorage
+from misc.cache import LRUCache, SingleFlight
 
 from misc.lang import Lang
 from misc.other import Other
 
 from decorators import async_timer
 
+import config
+
 
 class Accounts:
+    prefetch_list: dict = {}
 
     def __init__(self, message: types.Message | types.CallbackQuery) -> None:
         """
@@ -51,15 +60,7 @@ class Accounts:
             ClientModel: The client information.
         """
 
-        redis_key = f"mono_client_{self.message.chat.id}"
-        client = await RedisStorage().get(redis_key)
-        if client:
-            return ClientModel(**json.loads(client))
-
-        client = await Mono.client_info(self.message, await self.token)
-        await RedisStorage().set(redis_key, client.model_dump_json(), ex=60)
-
-        return client
+        return await Mono.client_info(self.message, await self.token)
     
     @property
     async def token(self) -> str | None:
@@ -72,25 +73,19 @@ class Accounts:
 
         return await RedisStorage().get(f"mono_auth_{self.message.chat.id}")
 
-    @async_timer
-    async def keyboard_create(
-            self, accounts: list[AccountModel], selected_account: AccountModel
-    ) -> InlineKeyboardMarkup:
+    @staticmethod
+    def sort_accounts(accounts: list[AccountModel]) -> list[AccountModel]:
         """
-        Asynchronously creates a keyboard with account information for user interaction.
+        Sorts the accounts in the order they are listed on the keyboard.
 
         Args:
             accounts (list[AccountModel]): The list of user accounts.
-            selected_account (AccountModel): The currently selected account.
 
         Returns:
-            InlineKeyboardMarkup: The created keyboard markup.
+            list[AccountModel]: The sorted accounts.
         """
 
-        keyboard = InlineKeyboardMarkup()
-        check_mark = "☑️"
-
-        accounts = sorted(
+        return sorted(
             accounts,
             key=lambda k: (
                 # sort main types
@@ -105,8 +100,26 @@ class Accounts:
                 else float('inf')
             )
         )
-        
-        for account in accounts:
+
+    @async_timer
+    async def keyboard_create(
+            self, accounts: list[AccountModel], selected_account: AccountModel
+    ) -> InlineKeyboardMarkup:
+        """
+        Asynchronously creates a keyboard with account information for user interaction.
+
+        Args:
+            accounts (list[AccountModel]): The list of user accounts.
+            selected_account (AccountModel): The currently selected account.
+
+        Returns:
+            InlineKeyboardMarkup: The created keyboard markup.
+        """
+
+        keyboard = InlineKeyboardMarkup()
+        check_mark = "☑️"
+
+        for account in self.sort_accounts(accounts):
             account_name = account.type.title()
             display_currency = account.currencyCode if account.type in ("black", "fop", "platinum", "iron",) else ""
 
@@ -161,44 +174,31 @@ class Accounts:
                     and account.currencyCode.upper() == data["currency"].upper():
                 return account
 
+    @staticmethod
     @async_timer
-    async def storage(self, account: AccountModel, message: types.Message = None) -> str | None:
+    async def storage(image: "AccountImage", message: types.Message = None) -> str | None:
         """
-        Asynchronously manages storage of account-related information.
+        Asynchronously manages the file_id of a rendered account image, keyed by the digest of its inputs.
 
         Args:
-            account (AccountModel): The account for which information is stored.
-            message (types.Message, optional): The associated Telegram message.
+            image (AccountImage): The account image the file_id belongs to.
+            message (types.Message, optional): The sent message to store the file_id from.
 
         Returns:
-            str | None: The file_id or None if not available.
+            str | None: The stored file_id when no message is given, otherwise None.
         """
 
-        key = f"acc_{account.type}_{account.currencyCode}_{self.message.chat.id}"
-        balance = int(account.balance*100)
-
-        id_buff = await RedisStorage().get(key)
-
-        if id_buff:
-            kv = json.loads(id_buff)
-            if balance == kv["balance"]:
-                return kv["file_id"]
+        key = f"render_{image.digest}"
 
         if not message:
-            return
+            return await RedisStorage().get(key)
 
         photo_list = message.photo
         if not photo_list:
             return
 
         photo_list = sorted(photo_list, key=lambda k: -k.file_size)
-        id_buff_var = {
-            "file_id": photo_list[0].file_id,
-            "balance": balance
-        }
-        await RedisStorage().set(key, json.dumps(id_buff_var), ex=1800)
-
-        return None
+        await RedisStorage().set(key, photo_list[0].file_id, ex=config.RENDER_CACHE_TTL)
 
     async def process(self) -> types.Message:
         """
@@ -217,12 +217,10 @@ class Accounts:
         else:
             selected_account = [a for a in accounts if a.currencyCode == "UAH"][0]
 
-        image = await AccountImage(self.message, selected_account, client.name).result()
+        image = AccountImage(selected_account, client.name, await AccountImage.captions(self.message))
         markup = await self.keyboard_create(accounts, selected_account)
 
-        file_id = await self.storage(selected_account)
-        if file_id:
-            image = file_id
+        photo = await self.storage(image) or await image.result()
 
         if self.query:
             try:
@@ -231,28 +229,116 @@ class Accounts:
                 pass
 
         answ_photo = await self.message.answer_photo(
-            image, reply_markup=markup
+            photo, reply_markup=markup
         )
 
-        await self.storage(selected_account, answ_photo)
+        await self.storage(image, answ_photo)
+
+        if config.PREFETCH_ACCOUNTS and not self.query:
+            self.prefetch([
+                AccountImage(account, client.name, image.labels)
+                for account in self.sort_accounts(accounts) if account is not selected_account
+            ])
+
         return answ_photo
 
+    def prefetch(self, images: list["AccountImage"]) -> None:
+        """
+        Starts rendering and uploading the other account images in the background, replacing a running prefetch.
+
+        Args:
+            images (list[AccountImage]): The account images in the order they are likely to be requested.
+        """
+
+        chat_id = self.message.chat.id
+        self.cancel_prefetch(chat_id)
+
+        Accounts.prefetch_list[chat_id] = asyncio.ensure_future(
+            self._prefetch_loop(chat_id, images[:config.PREFETCH_BUDGET])
+        )
+
+    @staticmethod
+    def cancel_prefetch(chat_id: int) -> None:
+        """
+        Cancels the background prefetch of the chat, if any.
+
+        Args:
+            chat_id (int): The chat the prefetch belongs to.
+        """
+
+        future = Accounts.prefetch_list.pop(chat_id, None)
+        if future:
+            future.cancel()
+
+    @classmethod
+    async def _prefetch_loop(cls, chat_id: int, images: list["AccountImage"]) -> None:
+        """
+        Renders the account images in one job once the render workers are idle and stores their file_id.
+
+        Without PREFETCH_CHAT the images are only rendered into the in-process render cache.
+
+        Args:
+            chat_id (int): The chat the prefetch belongs to.
+            images (list[AccountImage]): The account images to prefetch.
+        """
+
+        try:
+            images = [image for image in images if not await cls.storage(image)]
+
+            # low priority: wait until no user-facing render is queued
+            while RenderExecutor().depth >= config.RENDER_WORKERS:
+                await asyncio.sleep(.5)
+
+            photos = await AccountImage.render_batch(images)
+            if not config.PREFETCH_CHAT:
+                return
+
+            for image, photo in zip(images, photos):
+                if not photo:
+                    continue
+
+                msg = await bot.send_photo(config.PREFETCH_CHAT, photo, disable_notification=True)
+                await cls.storage(image, msg)
+
+                try:
+                    await msg.delete()
+                except exceptions.MessageToDeleteNotFound:
+                    pass
+        except (asyncio.TimeoutError, exceptions.TelegramAPIError) as e:
+            logging.warning("Prefetch of accounts for %d stopped: %s" % (chat_id, e))
+        finally:
+            if cls.prefetch_list.get(chat_id) is asyncio.current_task():
+                del cls.prefetch_list[chat_id]
+
 
 class AccountImage:
+    cards: LRUCache = LRUCache(config.CARD_CACHE_SIZE)
+    renders: LRUCache = LRUCache(config.RENDER_CACHE_LIMIT * 1024 ** 2, weigher=len)
+    flights: SingleFlight = SingleFlight()
+
+    # increase when the drawing changes, so cached renders of the old layout are not reused
+    version: int = 1
 
-    def __init__(self, message: types.Message, account: AccountModel, client_name: str) -> None:
+    # static layers baked into the backgrounds, pasted over the card
+    decorations: tuple = (
+        ("sitting_cat.png", (950, 420)),
+    )
+
+    def __init__(self, account: AccountModel, client_name: str, labels: dict) -> None:
         """
-        Initializes an AccountImage instance with the given Telegram message, account information, and client name.
+        Initializes an AccountImage instance with the given account information, client name and captions.
+
+        The instance holds only plain data, so it can be handed to a render worker process.
 
         Args:
-            message (types.Message): The Telegram message.
             account (AccountModel): The user account information.
             client_name (str): The name of the client.
+            labels (dict): The translated captions drawn on the image, see AccountImage.captions.
         """
 
-        self.message = message
         self.account = account
         self.client_name = client_name
+        self.labels = labels
 
         self.fonts = {
             "regular": "Montserrat-Regular.ttf",
@@ -279,14 +365,60 @@ class AccountImage:
 
         return "%s %s" % (Other.format_number(value), self.currency_symbols[currency])
 
+    @staticmethod
+    async def captions(message: types.Message) -> dict:
+        """
+        Asynchronously collects the translated captions drawn on the account image.
+
+        Args:
+            message (types.Message): The Telegram message for language translation.
+
+        Returns:
+            dict: The captions keyed by language key.
+        """
+
+        return {key: await Lang.get(key, message) for key in ("own_funds", "credit_limit",)}
+
     @property
-    @async_timer
-    async def card(self) -> Image:
+    def card_system(self) -> str | None:
         """
-        Property method to asynchronously create a card image based on user account information.
+        Property method to identify the card system from the masked card number.
 
         Returns:
-            Image: The generated card image.
+            str | None: The identified card system or None if not recognized.
+        """
+
+        card_number = int(self.account.maskedPan[0].replace("*", "0"))
+        return Other.identify_credit_card(card_number)
+
+    @property
+    def card(self) -> ImageProcess:
+        """
+        Property method to retrieve the transformed card image, drawing it only on a card cache miss.
+
+        Returns:
+            ImageProcess: The card image, shared with other renders until modified.
+        """
+
+        card_system_name = self.card_system
+        key = (self.account.type, self.account.currencyCode, self.client_name, card_system_name,)
+
+        card = self.cards.get(key)
+        if card is None:
+            card = self._draw_card(card_system_name).source
+            self.cards.set(key, card)
+
+        return ImageProcess(card)
+
+    def _draw_card(self, card_system_name: str) -> ImageProcess:
+        """
+        Draws the card holder, currency and card system logo on the card and applies the perspective.
+
+        Args:
+            card_system_name (str): The card system identified from the masked card number.
+
+        Returns:
+            ImageProcess: The generated card image.
         """
 
         card = ImageProcess(f"{self.account.type}-card.png")
@@ -312,9 +444,6 @@ class AccountImage:
         ) if self.account.type == "black" else None
 
         # build and paste card system logo on client card
-        card_number = int(self.account.maskedPan[0].replace("*", "0"))
-        card_system_name = Other.identify_credit_card(card_number)
-
         card_system = ImageProcess("%s-logo%s.png" % (
             card_system_name.lower(),
             "-%s" %
@@ -322,18 +451,18 @@ class AccountImage:
              else "black") if card_system_name == "VISA" else ""
         ))
 
-        card_sys = card_system.image
+        card_sys = card_system.source
         card.image.paste(card_sys, (440, 270), card_sys)
 
         card.perspective(-.3)
-        card.image = card.image.rotate(10, resample=Image.BICUBIC, expand=True)
+        card.rotate(10, expand=True)
 
         return card
 
     @property
-    async def background(self) -> str:
+    def background(self) -> str:
         """
-        Property method to asynchronously determine the background image for the account representation.
+        Property method to determine the background image for the account representation.
 
         Returns:
             str: The filename of the background image.
@@ -344,16 +473,71 @@ class AccountImage:
 
         return f"{self.account.type}_card_background.png"
 
-    @async_timer
-    async def build_image(self) -> bytes:
+    @classmethod
+    def precompose(cls) -> None:
+        """
+        Bakes the static decorations into every background variant of the image cache.
         """
-        Asynchronously constructs the final image combining the card and background images.
+
+        cache = ImageCache()
+        for file in sorted(os.listdir(cache.path)):
+            if file.endswith("_background.png"):
+                cache.compose(file, cls.decorations)
+
+        logging.info("Account backgrounds precomposed")
+
+    def _paste_card(self, background: ImageProcess, card: Image.Image, pos: tuple) -> None:
+        """
+        Pastes the card on the precomposed background, keeping the decorations it overlaps on top.
+
+        The overlapped area is reset to the undecorated background before the card is pasted,
+        so the result is the same as pasting the decorations after the card.
+
+        Args:
+            background (ImageProcess): The background with the decorations baked in.
+            card (Image.Image): The transformed card image.
+            pos (tuple): The position (x, y) of the card.
+        """
+
+        image = background.image
+        left, top = pos
+        right, bottom = left + card.width, top + card.height
+
+        overlaps = []
+        for file, (x, y) in self.decorations:
+            decoration = ImageProcess(file).source
+            box = (max(left, x), max(top, y), min(right, x + decoration.width), min(bottom, y + decoration.height))
+
+            if box[0] < box[2] and box[1] < box[3]:
+                image.paste(ImageProcess(self.background).source.crop(box), box[:2])
+                overlaps.append((decoration.crop((box[0] - x, box[1] - y, box[2] - x, box[3] - y)), box[:2]))
+
+        image.paste(card, pos, card)
+
+        for decoration, decoration_pos in overlaps:
+            image.paste(decoration, decoration_pos, decoration)
+
+    def build_image(self) -> bytes:
+        """
+        Constructs and encodes the final image combining the card and background images.
+
+        This is CPU-bound Pillow work and is meant to be run through the RenderExecutor.
 
         Returns:
             bytes: The final image bytes.
         """
 
-        background = ImageProcess(await self.background)
+        return bytes(self.draw())
+
+    def draw(self) -> ImageProcess:
+        """
+        Draws the balance, the credit lines and the card on the account background.
+
+        Returns:
+            ImageProcess: The final image, not yet encoded.
+        """
+
+        background = ImageProcess(ImageCache().compose(self.background, self.decorations))
         background.add_text(  # total balance
             text=self.int_display(self.account.balance, self.account.currencyCode),
             pos=(0, 45),
@@ -379,7 +563,7 @@ class AccountImage:
 
             # own funds
             background.add_text(
-                text=await Lang.get("own_funds", self.message),
+                text=self.labels["own_funds"],
                 pos=(vl, ow_h),
                 color=(color_tone,)*3,
                 font=self.fonts[font],
@@ -395,7 +579,7 @@ class AccountImage:
 
             # credit limit
             background.add_text(
-                text=await Lang.get("credit_limit", self.message),
+                text=self.labels["credit_limit"],
                 pos=(vl, cd_h),
                 color=(color_tone,)*3,
                 font=self.fonts[font],
@@ -410,22 +594,135 @@ class AccountImage:
             )
 
         # paste client card
-        card = await self.card
-        card = card.image
-        background.image.paste(card, (300, 240), card)
+        self._paste_card(background, self.card.source, (300, 240))
 
-        # decoration
-        cat = ImageProcess("sitting_cat.png").image
-        background.image.paste(cat, (950, 420), cat)
+        return background
+
+    @property
+    def digest(self) -> str:
+        """
+        Property method to hash every input of the render, so identical renders share one key.
+
+        Returns:
+            str: The hex digest of the render inputs.
+        """
+
+        inputs = {
+            "version": self.version,
+            "account": self.account.model_dump(include={"type", "currencyCode", "balance", "creditLimit", "maskedPan"}),
+            "client_name": self.client_name,
+            "labels": self.labels,
+            "encoder": str(ImageEncoder())
+        }
+
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @classmethod
+    async def invalidate(cls, account: AccountModel, client_name: str) -> int:
+        """
+        Asynchronously drops the cached renders and file_ids of the account image, in every language.
 
-        return bytes(background)
+        The name is translated the way Mono.client_info does for each language, and the captions follow
+        every valid language, so every combination a chat could have rendered is dropped.
 
+        Args:
+            account (AccountModel): The account as it was rendered.
+            client_name (str): The client name as returned upstream.
+
+        Returns:
+            int: The number of file_ids dropped.
+        """
+
+        languages = Lang.dictionary["valid_lang_keys"]
+        names = {Other.name_translate(language, client_name) for language in (*languages, Lang.default_lang)}
+
+        dropped = 0
+        for language in languages:
+            labels = {key: Lang.dictionary["keys"][key][language] for key in ("own_funds", "credit_limit",)}
+
+            for name in names:
+                digest = cls(account, name, labels).digest
+                cls.renders.forget(digest)
+                dropped += await RedisStorage().forget(f"render_{digest}")
+
+        return dropped
+
+    @staticmethod
+    def render_all(images: list["AccountImage"]) -> list[bytes | None]:
+        """
+        Renders the account images one after another in the calling worker, sharing its loaded assets.
+
+        Args:
+            images (list[AccountImage]): The account images to render.
+
+        Returns:
+            list[bytes | None]: The final image bytes, None for accounts without templates.
+        """
+
+        results = []
+        for image in images:
+            try:
+                results.append(image.build_image())
+            except (OSError, KeyError) as e:
+                logging.warning("Account %s can't be rendered: %r" % (image.account.type, e))
+                results.append(None)
+
+        return results
+
+    @classmethod
+    async def render_batch(cls, images: list["AccountImage"]) -> list[bytes | None]:
+        """
+        Asynchronously renders the account images missing from the render cache in a single render job.
+
+        Args:
+            images (list[AccountImage]): The account images to render.
+
+        Returns:
+            list[bytes | None]: The final image bytes in the order of the images.
+        """
+
+        digests = [image.digest for image in images]
+        results = {digest: cls.renders.get(digest) for digest in digests}
+
+        pending = [image for image, digest in zip(images, digests) if results[digest] is None]
+        if pending:
+            rendered = await RenderExecutor().run(cls.render_all, pending)
+
+            for image, result in zip(pending, rendered):
+                if result:
+                    cls.renders.set(image.digest, result)
+                results[image.digest] = result
+
+        return [results[digest] for digest in digests]
+
+    @async_timer
     async def result(self) -> bytes:
         """
-        Asynchronously retrieves the final image bytes.
+        Asynchronously retrieves the final image bytes, rendering them off the event loop on a render cache miss.
+
+        Concurrent requests for an identical image share a single render.
 
         Returns:
             bytes: The final image bytes.
         """
-        
-        return await self.build_image()
+
+        digest = self.digest
+
+        image = self.renders.get(digest)
+        if image is None:
+            image = await self.flights.do(digest, self._render)
+
+        return image
+
+    async def _render(self) -> bytes:
+        """
+        Asynchronously renders the image in the render executor and stores it in the render cache.
+
+        Returns:
+            bytes: The final image bytes.
+        """
+
+        image = await RenderExecutor().run(self.build_image)
+        self.renders.set(self.digest, image)
+
+        return image
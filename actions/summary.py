@@ -0,0 +1,355 @@
+import json
+import asyncio
+import hashlib
+import logging
+
+from aiogram import types
+
+from PIL import Image, ImageDraw
+
+from dispatcher import bot
+
+from misc.mono import Mono, RequestScheduler
+from misc.models.client_info import Model as ClientModel
+from misc.models.client_info import Account as AccountModel
+from misc.lang import Lang
+from misc.other import Other
+from misc.image import ImageProcess, ImageEncoder
+from misc.executor import RenderExecutor
+from misc.redis_storage import RedisStorage
+from misc.statement import StatementSync
+from misc.summary import SpendingSummary
+from misc.columns import CATEGORIES, day_starts
+
+from decorators import async_timer
+
+import config
+
+
+class SummaryImage:
+    size: tuple = (1000, 560)
+
+    background: tuple = (24, 24, 27)
+    spent_color: tuple = (239, 83, 80)
+    muted_color: tuple = (150, 150, 160)
+
+    currency_symbols: dict = {
+        "UAH": "₴",
+        "USD": "$",
+        "EUR": "€"
+    }
+
+    def __init__(self, title: str, currency: str, daily: list[int], categories: list[tuple[str, int]]) -> None:
+        """
+        Initializes a SummaryImage instance.
+
+        The instance holds only plain data, so it can be handed to a render worker process.
+
+        Args:
+            title (str): The title drawn above the chart.
+            currency (str): The currency of the amounts.
+            daily (list[int]): The spending of every day in minor units, oldest first.
+            categories (list[tuple[str, int]]): The translated category names and their spending in minor units,
+                largest first.
+        """
+
+        self.title = title
+        self.currency = currency
+        self.daily = daily
+        self.categories = categories
+
+    def amount_display(self, value: int) -> str:
+        """
+        Formats an amount with the symbol of the currency of the chart.
+
+        Args:
+            value (int): The amount in minor units.
+
+        Returns:
+            str: The formatted amount.
+        """
+
+        return "%s %s" % (Other.format_number(value / 100), self.currency_symbols[self.currency])
+
+    @property
+    def digest(self) -> str:
+        """
+        Property method to hash every input of the render, so identical charts share one key.
+
+        Returns:
+            str: The hex digest of the render inputs.
+        """
+
+        inputs = {
+            "title": self.title,
+            "currency": self.currency,
+            "daily": self.daily,
+            "categories": self.categories,
+            "encoder": str(ImageEncoder())
+        }
+
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def build_image(self) -> bytes:
+        """
+        Draws the daily spending bars and the largest categories and encodes the chart.
+
+        This is CPU-bound Pillow work and is meant to be run through the RenderExecutor.
+
+        Returns:
+            bytes: The final image bytes.
+        """
+
+        width, height = self.size
+        chart = ImageProcess(Image.new("RGB", self.size, self.background))
+        draw = ImageDraw.Draw(chart.image)
+
+        chart.add_text(self.title, (40, 30), font="Montserrat-SemiBold.ttf", size=34, align="left")
+
+        # daily bars
+        top, bottom, left, right = 100, 320, 40, width - 40
+        step = (right - left) / len(self.daily)
+        peak = max(self.daily) or 1
+
+        for day, value in enumerate(self.daily):
+            x = left + day * step
+            bar_top = bottom - (bottom - top) * value / peak
+            draw.rectangle((x + 2, min(bar_top, bottom - 2), x + step - 2, bottom), fill=self.spent_color)
+
+        chart.add_text(self.amount_display(peak), (left, top - 26), self.muted_color, size=18, align="left")
+
+        # largest categories
+        category_peak = self.categories[0][1] if self.categories else 1
+        for row, (name, value) in enumerate(self.categories[:5]):
+            y = 350 + row * 40
+            bar_width = (right - 520) * value / category_peak
+
+            chart.add_text(name, (left, y), size=22, align="left")
+            draw.rectangle((300, y + 4, 300 + max(bar_width, 2), y + 26), fill=self.spent_color)
+            chart.add_text(self.amount_display(value), (310 + bar_width, y), self.muted_color, size=22, align="left")
+
+        return bytes(chart)
+
+    async def result(self) -> bytes:
+        """
+        Asynchronously renders the chart off the event loop.
+
+        Returns:
+            bytes: The final image bytes.
+        """
+
+        return await RenderExecutor().run(self.build_image)
+
+
+class Summary:
+    background: set[asyncio.Task] = set()
+
+    def __init__(self, message: types.Message) -> None:
+        """
+        Initializes a Summary instance with the given Telegram message.
+
+        Args:
+            message (types.Message): The Telegram message triggering the /summary command.
+        """
+
+        self.message = message
+
+    @property
+    def days(self) -> int:
+        """
+        Property method to retrieve the number of days asked for, bounded by the synced history.
+
+        Returns:
+            int: The number of days, today included.
+        """
+
+        args = self.message.get_args()
+        days = int(args) if args and args.isdigit() else config.SUMMARY_DAYS
+
+        return max(1, min(days, config.STATEMENT_HISTORY // 86400))
+
+    @staticmethod
+    async def storage(image: SummaryImage, message: types.Message = None) -> str | None:
+        """
+        Asynchronously manages the file_id of a rendered chart, keyed by the digest of its inputs.
+
+        Args:
+            image (SummaryImage): The chart the file_id belongs to.
+            message (types.Message, optional): The sent message to store the file_id from.
+
+        Returns:
+            str | None: The stored file_id when no message is given, otherwise None.
+        """
+
+        key = f"summary_render_{image.digest}"
+
+        if not message:
+            return await RedisStorage().get(key)
+
+        if message.photo:
+            photo = max(message.photo, key=lambda p: p.file_size or 0)
+            await RedisStorage().set(key, photo.file_id, ex=config.RENDER_CACHE_TTL)
+
+            # Lists the charts of the chat, so they can be dropped on logout
+            await RedisStorage().add_members(f"summary_renders_{message.chat.id}", [key], ex=config.RENDER_CACHE_TTL)
+
+    @staticmethod
+    async def forget(chat_id: int) -> None:
+        """
+        Asynchronously drops the file_id of every chart rendered for a chat.
+
+        Args:
+            chat_id (int): The chat.
+        """
+
+        key = f"summary_renders_{chat_id}"
+        await RedisStorage().forget_many(await RedisStorage().get_members(key) + [key])
+
+    @async_timer
+    async def sync(self, token: str, client: ClientModel) -> list[AccountModel]:
+        """
+        Asynchronously syncs the statement of the accounts that have never been synced.
+
+        Accounts with a stored statement are charted from it as it is, the ones not synced within
+        STATEMENT_SYNC_INTERVAL are synced in the background for the next summary. Accounts are synced
+        one after another, so every request waits for the budget of the token on its own instead of
+        queueing behind the requests of all the other accounts.
+
+        Args:
+            token (str): The Mono authentication token.
+            client (ClientModel): The client information listing the accounts.
+
+        Returns:
+            list[AccountModel]: The accounts without a stored statement whose statement could not be synced.
+        """
+
+        failed, stale = [], []
+        for account in client.accounts:
+            statement = StatementSync(token, account.id, self.message.chat.id)
+
+            if await statement.cursor is None:
+                if await statement.sync(RequestScheduler.INTERACTIVE) is None:
+                    failed.append(account)
+            elif not await statement.fresh:
+                stale.append(statement)
+
+        if stale:
+            task = asyncio.ensure_future(self._sync_background(stale))
+            self.background.add(task)
+            task.add_done_callback(self.background.discard)
+
+        return failed
+
+    @staticmethod
+    async def _sync_background(statements: list[StatementSync]) -> None:
+        """
+        Asynchronously syncs statements one after another at background priority.
+
+        Args:
+            statements (list[StatementSync]): The statements to sync.
+        """
+
+        for statement in statements:
+            try:
+                await statement.sync(RequestScheduler.BACKGROUND)
+            except Exception as e:
+                logging.warning("Background statement sync of %s failed: %s" % (statement.account, e))
+
+    @async_timer
+    async def totals(self, client: ClientModel, days: int) -> dict:
+        """
+        Asynchronously sums the per-day aggregates of the synced statements by currency.
+
+        Args:
+            client (ClientModel): The client information listing the accounts.
+            days (int): The number of days, today included.
+
+        Returns:
+            dict: The spending per category, the spending per day and the income in minor units, keyed by currency.
+        """
+
+        starts = day_starts(days)
+        totals = {}
+
+        for account in client.accounts:
+            total = totals.setdefault(account.currencyCode, {
+                "spent": [0] * len(CATEGORIES),
+                "daily": [0] * days,
+                "income": 0
+            })
+
+            for day, partial in enumerate(await SpendingSummary(account.id).partials(starts)):
+                total["spent"] = [a + b for a, b in zip(total["spent"], partial["spent"])]
+                total["daily"][day] += sum(partial["spent"])
+                total["income"] += partial["income"]
+
+        return {currency: total for currency, total in totals.items() if sum(total["spent"]) or total["income"]}
+
+    async def caption(self, totals: dict, title: str) -> str:
+        """
+        Asynchronously composes the caption listing the spending and the income in every currency.
+
+        Args:
+            totals (dict): The totals keyed by currency, see totals.
+            title (str): The translated title.
+
+        Returns:
+            str: The caption.
+        """
+
+        spent, income = await Lang.get("summary_spent", self.message), await Lang.get("summary_income", self.message)
+
+        lines = [f"<b>{title}</b>"]
+        for currency, total in totals.items():
+            lines.append("%s: %s %s · %s: %s %s" % (
+                spent, Other.format_number(sum(total["spent"]) / 100), currency,
+                income, Other.format_number(total["income"] / 100), currency
+            ))
+
+        return "\n".join(lines)
+
+    async def process(self) -> types.Message:
+        """
+        Initiates the spending summary, syncing the statements and replying with the chart.
+
+        Returns:
+            types.Message: The message with the chart.
+        """
+
+        token = await RedisStorage().get(f"mono_auth_{self.message.chat.id}")
+        if not token:
+            return await self.message.reply(await Lang.get("summary_unauthorized", self.message))
+
+        await bot.send_chat_action(self.message.chat.id, types.ChatActions.UPLOAD_PHOTO)
+
+        client = await Mono.client_info(self.message, token)
+
+        # a partial statement would be charted as if it were complete
+        failed = await self.sync(token, client)
+        if failed:
+            return await self.message.reply(await Lang.get("summary_sync_failed", self.message) % ", ".join(
+                " ".join(account.maskedPan[:1] + [account.currencyCode]) for account in failed
+            ))
+
+        days = self.days
+        totals = await self.totals(client, days)
+
+        if not totals:
+            return await self.message.reply(await Lang.get("summary_empty", self.message) % days)
+
+        title = await Lang.get("summary", self.message) % days
+
+        # the chart shows the currency with the most spending
+        currency, total = max(totals.items(), key=lambda item: sum(item[1]["spent"]))
+        categories = sorted(
+            [(await Lang.get(f"mcc_{name}", self.message), value) for name, value in zip(CATEGORIES, total["spent"])],
+            key=lambda category: -category[1]
+        )
+
+        image = SummaryImage(title, currency, total["daily"], [c for c in categories if c[1]])
+        photo = await self.storage(image) or await image.result()
+
+        message = await self.message.reply_photo(photo, caption=await self.caption(totals, title))
+        await self.storage(image, message)
+
+        return message
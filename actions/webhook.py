@@ -0,0 +1,123 @@
+import logging
+
+from aiohttp import web
+from pydantic import ValidationError
+
+from misc.mono import Mono
+from misc.models.webhook import Model as WebhookModel
+
+from actions.client import AccountImage
+
+import config
+
+
+class StatementWebhook:
+    runner: web.AppRunner = None
+    min_path_length: int = 24
+
+    metrics: dict = {
+        "received": 0,
+        "applied": 0,
+        "invalid": 0,
+        "renders_dropped": 0
+    }
+
+    def __init__(self) -> None:
+        """
+        Initializes a StatementWebhook instance with the configured listening address.
+        """
+
+        self.host: str = config.WEBHOOK_HOST
+        self.port: int = config.WEBHOOK_PORT
+        self.path: str = config.WEBHOOK_PATH
+
+    async def start(self) -> None:
+        """
+        Asynchronously starts the web server receiving the statement webhooks.
+
+        Upstream does not sign the webhooks, so the secret path is all that keeps others from posting
+        fake balances, and the receiver is not started without one.
+
+        Raises:
+            ValueError: If WEBHOOK_PATH is not set or too short to be a secret.
+        """
+
+        if not self.path or not self.path.startswith("/") or len(self.path) < self.min_path_length:
+            raise ValueError(
+                "WEBHOOK_PATH must be set to a secret path of at least %d characters" % self.min_path_length
+            )
+
+        app = web.Application()
+        app.router.add_get(self.path, self.verify)
+        app.router.add_post(self.path, self.receive)
+
+        StatementWebhook.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+        logging.info("Statement webhook receiver listening on %s:%d" % (self.host, self.port))
+
+    @staticmethod
+    async def shutdown() -> None:
+        """
+        Asynchronously stops the web server.
+        """
+
+        if StatementWebhook.runner:
+            await StatementWebhook.runner.cleanup()
+            StatementWebhook.runner = None
+
+    @staticmethod
+    async def verify(_: web.Request) -> web.Response:
+        """
+        Answers the request upstream makes to check the webhook URL before it is set.
+        """
+
+        return web.Response()
+
+    @classmethod
+    async def receive(cls, request: web.Request) -> web.Response:
+        """
+        Asynchronously applies a statement event to the cached client information and drops the renders
+        showing the previous balance.
+
+        Upstream retries events that are not answered with 200, so only malformed events are refused.
+
+        Args:
+            request (web.Request): The webhook request.
+
+        Returns:
+            web.Response: An empty response.
+        """
+
+        cls.metrics["received"] += 1
+
+        try:
+            event = WebhookModel.model_validate(await request.json())
+        except (ValueError, ValidationError):
+            cls.metrics["invalid"] += 1
+            return web.Response(status=400)
+
+        if event.type != "StatementItem" or not event.data:
+            return web.Response()
+
+        applied = await Mono.apply_statement(event.data.account, event.data.statementItem.balance)
+        if applied:
+            cls.metrics["applied"] += 1
+            cls.metrics["renders_dropped"] += await AccountImage.invalidate(*applied)
+
+        return web.Response()
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Collects the event counters of the receiver.
+
+        Returns:
+            dict: Whether the receiver is running along with the counters.
+        """
+
+        return {
+            "running": cls.runner is not None,
+            **cls.metrics
+        }
@@ -2,10 +2,19 @@ from aiogram import executor, Dispatcher
 from dispatcher import dp  # Import the Dispatcher instance from the dispatcher module
 
 from misc.lang import Lang  # Import the Lang class for language-related operations
+from misc.image import ImagePack, ImageCache, FontRegistry, GlyphAtlas  # Import the image caches
+from misc.executor import RenderExecutor  # Import the RenderExecutor class for off-loop image rendering
 from misc.redis_storage import RedisStorage  # Import the RedisStorage class for handling Redis storage
+from misc.mono import MonoAPI  # Import the MonoAPI class for the pooled Mono API session
+
+from actions.client import AccountImage  # Import the AccountImage class for precomposing backgrounds
+from actions.auth import AuthPoller  # Import the AuthPoller class checking pending QR logins
+from actions.webhook import StatementWebhook  # Import the StatementWebhook class receiving balance updates
 
 import handlers  # Import your handlers module with message and callback query handlers
 
+import config
+
 _ = handlers
 
 
@@ -18,7 +27,18 @@ async def startup(_: Dispatcher) -> None:
 
     """
     Lang().load()  # Load language data using the Lang class
+    if config.IMAGE_PACK:
+        ImagePack().update()  # Build the raw RGBA template pack if templates changed
+    ImageCache().load()  # Load image templates into the in-process cache
+    FontRegistry().load()  # Load the known font faces and sizes
+    GlyphAtlas.load()  # Rasterize the amount characters once
+    AccountImage.precompose()  # Bake static decorations into the account backgrounds
+    RenderExecutor().create()  # Start the image render workers
     RedisStorage().create_cursor()  # Create a cursor for the Redis storage
+    MonoAPI().create_session()  # Open the pooled Mono API session
+    AuthPoller.start()  # Start checking pending QR logins
+    if config.WEBHOOK_ENABLED:
+        await StatementWebhook().start()  # Start receiving statement webhooks
 
 
 async def shutdown(_: Dispatcher) -> None:
@@ -29,7 +49,11 @@ async def shutdown(_: Dispatcher) -> None:
         _: Dispatcher: The Dispatcher instance.
 
     """
+    AuthPoller.stop()  # Stop checking pending QR logins
+    await StatementWebhook.shutdown()  # Stop receiving statement webhooks
     await RedisStorage().shutdown()  # Shutdown Redis storage
+    RenderExecutor.shutdown()  # Stop the image render workers
+    await MonoAPI.shutdown()  # Close the pooled Mono API connections
 
 
 if __name__ == "__main__":
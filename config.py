@@ -26,6 +26,162 @@ try:
     # Google Analytics Secret for authentication
     GA_SECRET = os.getenv("GA_SECRET")
 
+    # Memory cap in megabytes for decoded and composed images kept in process, pack-backed templates excluded
+    IMAGE_CACHE_LIMIT = int(os.getenv("IMAGE_CACHE_LIMIT", 96))
+
+    # Map image templates from the raw RGBA pack file instead of decoding PNG in every process
+    IMAGE_PACK = os.getenv("IMAGE_PACK", "true").lower() in ("1", "true", "yes")
+
+    # Number of transformed card images kept in process
+    CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", 32))
+
+    # Output format of rendered images: PNG, WEBP or JPEG
+    IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "PNG")
+
+    # Quality of lossy output formats, 1-100
+    IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 90))
+
+    # PNG zlib compression level 0-9, or WEBP encoder method 0-6
+    IMAGE_COMPRESS_LEVEL = int(os.getenv("IMAGE_COMPRESS_LEVEL", 6))
+
+    # Let the encoder make an extra pass to shrink the output
+    IMAGE_OPTIMIZE = os.getenv("IMAGE_OPTIMIZE", "false").lower() in ("1", "true", "yes")
+
+    # Memory cap in megabytes for encoded account images kept in process
+    RENDER_CACHE_LIMIT = int(os.getenv("RENDER_CACHE_LIMIT", 16))
+
+    # Lifetime in seconds of a stored file_id of an account image
+    RENDER_CACHE_TTL = int(os.getenv("RENDER_CACHE_TTL", 86400))
+
+    # Render the other account images in the background after /accounts
+    PREFETCH_ACCOUNTS = os.getenv("PREFETCH_ACCOUNTS", "false").lower() in ("1", "true", "yes")
+
+    # Number of other account images prefetched per /accounts
+    PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", 3))
+
+    # Chat the prefetched images are uploaded to, so their file_id is ready; unset to keep them in process only
+    PREFETCH_CHAT = os.getenv("PREFETCH_CHAT")
+
+    # Output format of the login QR image; JPEG is the cheapest to encode and upload
+    QR_IMAGE_FORMAT = os.getenv("QR_IMAGE_FORMAT", "JPEG")
+
+    # Number of opaque login QR backgrounds kept in process
+    QR_FRAME_CACHE_SIZE = int(os.getenv("QR_FRAME_CACHE_SIZE", 8))
+
+    # Pool used for rendering images off the event loop: "thread" or "process"
+    RENDER_EXECUTOR = os.getenv("RENDER_EXECUTOR", "thread")
+
+    # Number of render workers
+    RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+    # Number of render jobs allowed to wait for a free worker
+    RENDER_QUEUE = int(os.getenv("RENDER_QUEUE", 16))
+
+    # Time limit in seconds for a single render job, queue wait included
+    RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", 15))
+
+    # Base URL of the Mono API, scheme included; point it at tools/mono_server.py for local testing
+    MONO_API_URL = os.getenv("MONO_API_URL", "https://api.mono.sominemo.com").rstrip("/")
+
+    # Maximum number of pooled connections to the Mono API host
+    MONO_POOL_LIMIT = int(os.getenv("MONO_POOL_LIMIT", 16))
+
+    # Time in seconds an idle Mono API connection is kept open for reuse
+    MONO_KEEPALIVE = float(os.getenv("MONO_KEEPALIVE", 30))
+
+    # Time in seconds a resolved Mono API address is reused
+    MONO_DNS_TTL = int(os.getenv("MONO_DNS_TTL", 300))
+
+    # Time limit in seconds for connecting to the Mono API, pool wait included
+    MONO_CONNECT_TIMEOUT = float(os.getenv("MONO_CONNECT_TIMEOUT", 5))
+
+    # Time limit in seconds between two reads of a Mono API response
+    MONO_READ_TIMEOUT = float(os.getenv("MONO_READ_TIMEOUT", 15))
+
+    # Age in seconds up to which cached client info is served without refreshing it
+    CLIENT_FRESH_TTL = int(os.getenv("CLIENT_FRESH_TTL", 60))
+
+    # Age in seconds up to which cached client info is served while it is refreshed in the background
+    CLIENT_STALE_TTL = int(os.getenv("CLIENT_STALE_TTL", 900))
+
+    # Delay in seconds between the first checks of a pending QR login
+    AUTH_POLL_INTERVAL = float(os.getenv("AUTH_POLL_INTERVAL", 2))
+
+    # Longest delay in seconds between checks of a pending QR login, reached as it stays pending
+    AUTH_POLL_MAX_INTERVAL = float(os.getenv("AUTH_POLL_MAX_INTERVAL", 10))
+
+    # Time in seconds after which a pending QR login is given up
+    AUTH_POLL_TIMEOUT = float(os.getenv("AUTH_POLL_TIMEOUT", 180))
+
+    # Time limit in seconds for a single check of a pending QR login
+    AUTH_POLL_CHECK_TIMEOUT = float(os.getenv("AUTH_POLL_CHECK_TIMEOUT", 30))
+
+    # Number of pending QR logins checked upstream at the same time
+    AUTH_POLL_CONCURRENCY = int(os.getenv("AUTH_POLL_CONCURRENCY", 8))
+
+    # Number of Mono API calls a single token may make in a burst
+    MONO_TOKEN_BUDGET = int(os.getenv("MONO_TOKEN_BUDGET", 5))
+
+    # Time in seconds it takes a token to regain one call of its budget
+    MONO_TOKEN_REFILL = float(os.getenv("MONO_TOKEN_REFILL", 12))
+
+    # Number of calls to a single Mono API endpoint in a burst, all tokens together
+    MONO_ENDPOINT_BUDGET = int(os.getenv("MONO_ENDPOINT_BUDGET", 20))
+
+    # Time in seconds it takes an endpoint to regain one call of its budget
+    MONO_ENDPOINT_REFILL = float(os.getenv("MONO_ENDPOINT_REFILL", .5))
+
+    # Time limit in seconds a Mono API call may wait for its budget
+    MONO_QUEUE_TIMEOUT = float(os.getenv("MONO_QUEUE_TIMEOUT", 30))
+
+    # Number of times a Mono API call is retried after a timeout, 429 or 5xx response
+    MONO_RETRIES = int(os.getenv("MONO_RETRIES", 2))
+
+    # Base delay in seconds of the jittered exponential backoff between retries
+    MONO_RETRY_BACKOFF = float(os.getenv("MONO_RETRY_BACKOFF", .5))
+
+    # Run the receiver of Mono statement webhooks, which keeps cached balances up to date
+    WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    # Address and port the webhook receiver listens on
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8081))
+
+    # Secret path the webhooks are posted to, required with WEBHOOK_ENABLED as the webhooks are not signed,
+    # e.g. "/mono/" followed by the output of `python -c "import secrets; print(secrets.token_urlsafe(24))"`
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH")
+
+    # Age in seconds up to which cached client info that has received a webhook is served without refreshing it,
+    # kept below CLIENT_STALE_TTL
+    WEBHOOK_FRESH_TTL = int(os.getenv("WEBHOOK_FRESH_TTL", 600))
+
+    # Time in seconds a single statement request may span, as limited upstream: 31 days and 1 hour
+    STATEMENT_WINDOW = int(os.getenv("STATEMENT_WINDOW", 2682000))
+
+    # Number of items upstream returns in a single statement page at most
+    STATEMENT_PAGE = int(os.getenv("STATEMENT_PAGE", 500))
+
+    # Time in seconds of history fetched by the first sync of an account
+    STATEMENT_HISTORY = int(os.getenv("STATEMENT_HISTORY", 31 * 86400))
+
+    # Time in seconds of history kept in storage
+    STATEMENT_RETENTION = int(os.getenv("STATEMENT_RETENTION", 93 * 86400))
+
+    # Time in seconds before the cursor that is fetched again, for items that arrive late
+    STATEMENT_OVERLAP = int(os.getenv("STATEMENT_OVERLAP", 300))
+
+    # Time in seconds after a completed sync within which the stored statement is served without fetching
+    STATEMENT_SYNC_INTERVAL = int(os.getenv("STATEMENT_SYNC_INTERVAL", 60))
+
+    # Number of days /summary covers when no number is given
+    SUMMARY_DAYS = int(os.getenv("SUMMARY_DAYS", 30))
+
+    # Time zone the days of /summary start in
+    SUMMARY_TIMEZONE = os.getenv("SUMMARY_TIMEZONE", "Europe/Kyiv")
+
+    # JSON backend for Mono responses and cached data: "ujson" or "json"
+    JSON_CODEC = os.getenv("JSON_CODEC", "ujson")
+
 except (TypeError, ValueError) as ex:
     # Log an error if there's an issue while reading configuration variables
     logging.error(f"Error while reading config: {ex}")
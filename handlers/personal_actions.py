@@ -5,6 +5,7 @@ from actions.start import Start
 from actions.auth import LogOut
 from actions.basic import CheckProto, Sys
 from actions.client import Accounts
+from actions.summary import Summary
 
 from misc.lang import Lang
 
@@ -66,6 +67,24 @@ async def cmd_accounts(message: types.Message) -> types.Message:
     return await Accounts(message).process()
 
 
+@dp.message_handler(commands="summary", chat_type=types.ChatType.PRIVATE)
+@rate_limit(2, "summary")
+async def cmd_summary(message: types.Message) -> types.Message:
+    """
+    Handle the /summary command in private chats.
+
+    This command shows the spending of the last days by category, optionally for the number of days given
+
+    Args:
+        message (types.Message): The incoming Telegram message.
+
+    Returns:
+        types.Message: The result of processing the /summary command.
+    """
+
+    return await Summary(message).process()
+
+
 @dp.message_handler(is_owner=True, commands="check-proto")
 async def cmd_check_proto(message: types.Message) -> types.Message:
     """
@@ -0,0 +1,194 @@
+import asyncio
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class LRUCache:
+
+    def __init__(self, limit: int, weigher: Callable[[Any], int] = None) -> None:
+        """
+        Initializes an LRUCache instance.
+
+        Args:
+            limit (int): The maximum total weight of the stored values.
+            weigher (Callable[[Any], int], optional): Returns the weight of a value.
+                Defaults to None, in which case every value weighs 1 and the limit is an item count.
+        """
+
+        self.limit = limit
+        self.weigher = weigher or (lambda _: 1)
+
+        self.items: OrderedDict = OrderedDict()
+        self.weight: int = 0
+        self.lock = Lock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Retrieves the value stored under the key and marks it as recently used.
+
+        Args:
+            key (Hashable): The key to look up.
+
+        Returns:
+            Any | None: The stored value or None if the key is not cached.
+        """
+
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return
+
+            self.hits += 1
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> bool:
+        """
+        Stores the value under the key, evicting the least recently used values over the limit.
+
+        Args:
+            key (Hashable): The key to store the value under.
+            value (Any): The value to be stored.
+
+        Returns:
+            bool: True if the value was stored, False if it alone exceeds the limit.
+        """
+
+        weight = self.weigher(value)
+        if weight > self.limit:
+            return False
+
+        with self.lock:
+            self._forget(key)
+
+            self.items[key] = value
+            self.weight += weight
+
+            while self.weight > self.limit:
+                _, evicted = self.items.popitem(last=False)
+                self.weight -= self.weigher(evicted)
+                self.evictions += 1
+
+        return True
+
+    def forget(self, key: Hashable) -> None:
+        """
+        Removes the key from the cache if present.
+
+        Args:
+            key (Hashable): The key to remove.
+        """
+
+        with self.lock:
+            self._forget(key)
+
+    def _forget(self, key: Hashable) -> None:
+        """
+        Removes the value under the key and its weight, with the lock held by the caller.
+
+        Args:
+            key (Hashable): The key to remove.
+        """
+
+        value = self.items.pop(key, None)
+        if value is not None:
+            self.weight -= self.weigher(value)
+
+    def clear(self) -> None:
+        """
+        Removes every value from the cache.
+        """
+
+        with self.lock:
+            self.items.clear()
+            self.weight = 0
+
+    @property
+    def stats(self) -> dict:
+        """
+        Collects the usage counters of the cache.
+
+        Returns:
+            dict: The hit, miss and eviction counters along with the current size and weight.
+        """
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self.items),
+            "weight": self.weight,
+            "limit": self.limit
+        }
+
+
+class SingleFlight:
+
+    def __init__(self) -> None:
+        """
+        Initializes a SingleFlight instance with no calls in flight.
+        """
+
+        self.calls: dict = {}
+
+        self.started: int = 0
+        self.joined: int = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]) -> Any:
+        """
+        Runs the coroutine function once per key, letting concurrent callers with the same key await its result.
+
+        A caller that is cancelled stops waiting without cancelling the shared call.
+
+        Args:
+            key (Hashable): The key identifying identical calls.
+            func (Callable[[], Awaitable]): The coroutine function producing the result.
+
+        Returns:
+            Any: The result of the shared call.
+        """
+
+        future = self.calls.get(key)
+
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self.calls[key] = future
+            self.started += 1
+
+            def done(_: asyncio.Future) -> None:
+                if self.calls.get(key) is future:
+                    del self.calls[key]
+
+            future.add_done_callback(done)
+        else:
+            self.joined += 1
+
+        return await asyncio.shield(future)
+
+    @property
+    def stats(self) -> dict:
+        """
+        Collects the usage counters of the single flight.
+
+        Returns:
+            dict: The number of started and joined calls and the calls in flight.
+        """
+
+        return {
+            "started": self.started,
+            "joined": self.joined,
+            "in_flight": len(self.calls)
+        }
@@ -0,0 +1,41 @@
+import json
+
+from functools import partial
+from typing import Any, Callable
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+import config
+
+
+class Codec:
+    name: str = None
+
+    loads: Callable[[str | bytes], Any] = None
+    dumps: Callable[[Any], str] = None
+
+    @classmethod
+    def use(cls, name: str) -> None:
+        """
+        Switches the JSON backend used for upstream bodies and stored blobs.
+
+        Args:
+            name (str): Either "ujson" or "json", the standard library; "ujson" falls back to "json"
+                when it is not installed.
+        """
+
+        if name == "ujson" and ujson:
+            cls.loads = staticmethod(ujson.loads)
+            cls.dumps = staticmethod(partial(ujson.dumps, ensure_ascii=False, escape_forward_slashes=False))
+        else:
+            name = "json"
+            cls.loads = staticmethod(json.loads)
+            cls.dumps = staticmethod(partial(json.dumps, ensure_ascii=False, separators=(",", ":")))
+
+        cls.name = name
+
+
+Codec.use(config.JSON_CODEC)
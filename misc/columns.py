@@ -0,0 +1,206 @@
+import sys
+import time
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import config
+
+
+# spending categories, the names are language keys prefixed with "mcc_"
+CATEGORIES: tuple = (
+    "groceries", "restaurants", "transport", "shopping", "entertainment",
+    "utilities", "health", "transfers", "cash", "other"
+)
+
+# inclusive MCC ranges of the categories, the first range listed wins
+MCC_RANGES: tuple = (
+    ("groceries", ((5411, 5411), (5422, 5422), (5441, 5441), (5451, 5451), (5462, 5462), (5499, 5499))),
+    ("restaurants", ((5811, 5814),)),
+    ("transport", ((4000, 4199), (4411, 4411), (4511, 4511), (4582, 4582), (4784, 4789), (5541, 5542), (7511, 7523))),
+    ("entertainment", ((7829, 7999),)),
+    ("utilities", ((4812, 4816), (4899, 4900))),
+    ("health", ((5122, 5122), (5912, 5912), (8011, 8099))),
+    ("transfers", ((4829, 4829), (6012, 6012), (6051, 6051), (6538, 6540))),
+    ("cash", ((6010, 6011),)),
+    ("shopping", ((5000, 5999),)),
+)
+
+
+def _category_table() -> array:
+    table = array("B", [CATEGORIES.index("other")]) * 10000
+
+    for name, ranges in reversed(MCC_RANGES):
+        for low, high in ranges:
+            table[low:high + 1] = array("B", [CATEGORIES.index(name)]) * (high - low + 1)
+
+    return table
+
+
+CATEGORY_TABLE: array = _category_table()
+
+
+def day_start(moment: float, days: int = 0) -> int:
+    """
+    Computes where the day of a moment starts in the configured time zone.
+
+    Args:
+        moment (float): The Unix time.
+        days (int, optional): The number of days to move by, -1 for the day before. Defaults to 0.
+
+    Returns:
+        int: The Unix time of the start of the day.
+    """
+
+    zone = ZoneInfo(config.SUMMARY_TIMEZONE)
+    date = datetime.fromtimestamp(moment, zone).date() + timedelta(days=days)
+
+    return int(datetime.combine(date, datetime.min.time(), zone).timestamp())
+
+
+def day_starts(days: int, now: float = None) -> list[int]:
+    """
+    Computes where the last days start in the configured time zone.
+
+    Args:
+        days (int): The number of days, today included.
+        now (float, optional): The current Unix time. Defaults to now.
+
+    Returns:
+        list[int]: The start of every day, oldest first, followed by the end of today.
+    """
+
+    now = now or time.time()
+    return [day_start(now, -day) for day in range(days - 1, -2, -1)]
+
+
+class DayColumns:
+    # count, then the time, amount and category columns
+    header: str = "I"
+    typecodes: tuple = ("q", "q", "B")
+
+    def __init__(self, times: array, amounts: array, categories: array) -> None:
+        """
+        Initializes a DayColumns instance from the columns of the statement items of a day.
+
+        The items are sorted by category and then by amount, so the spending and the income of every category
+        are contiguous runs of the amount column.
+
+        Args:
+            times (array): The Unix times of the items.
+            amounts (array): The amounts of the items in minor units.
+            categories (array): The indexes of the categories of the items in CATEGORIES.
+        """
+
+        self.time = times
+        self.amount = amounts
+        self.category = categories
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    @classmethod
+    def build(cls, records: list[dict]) -> "DayColumns":
+        """
+        Lays statement items out as columns, this is the only place items are handled one by one.
+
+        Args:
+            records (list[dict]): The statement items.
+
+        Returns:
+            DayColumns: The columns.
+        """
+
+        rows = sorted((CATEGORY_TABLE[record["mcc"] % 10000], record["amount"], record["time"]) for record in records)
+
+        return cls(
+            array("q", [row[2] for row in rows]),
+            array("q", [row[1] for row in rows]),
+            array("B", [row[0] for row in rows])
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Packs the columns for storage, in little-endian byte order.
+
+        Returns:
+            bytes: The packed columns.
+        """
+
+        columns = [array(self.header, [len(self)]), self.time, self.amount, self.category]
+
+        if sys.byteorder == "big":
+            columns = [array(column.typecode, column) for column in columns]
+            for column in columns:
+                column.byteswap()
+
+        return b"".join(column.tobytes() for column in columns)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DayColumns":
+        """
+        Unpacks the columns packed by to_bytes.
+
+        Args:
+            data (bytes): The packed columns.
+
+        Returns:
+            DayColumns: The columns.
+        """
+
+        count = array(cls.header, data[:array(cls.header).itemsize])
+        offset = count.itemsize
+
+        if sys.byteorder == "big":
+            count.byteswap()
+
+        columns = []
+        for typecode in cls.typecodes:
+            column = array(typecode)
+            size = column.itemsize * count[0]
+
+            column.frombytes(data[offset:offset + size])
+            if sys.byteorder == "big":
+                column.byteswap()
+
+            columns.append(column)
+            offset += size
+
+        return cls(*columns)
+
+    @classmethod
+    def empty(cls) -> "DayColumns":
+        """
+        Creates the columns of a day without statement items.
+
+        Returns:
+            DayColumns: The empty columns.
+        """
+
+        return cls(*(array(typecode) for typecode in cls.typecodes))
+
+    def aggregate(self) -> dict:
+        """
+        Sums the spending by category and the income of the day.
+
+        Every category is found by bisection and its runs of the amount column are summed by the built-in sum,
+        so no Python code runs per item.
+
+        Returns:
+            dict: The spending per category in minor units, the income in minor units and the number of items.
+        """
+
+        spent = [0] * len(CATEGORIES)
+        income = 0
+
+        high = 0
+        for category in range(len(CATEGORIES)):
+            low, high = high, bisect_right(self.category, category, high)
+            zero = bisect_left(self.amount, 0, low, high)
+
+            spent[category] = -sum(self.amount[low:zero])
+            income += sum(self.amount[zero:high])
+
+        return {"spent": spent, "income": income, "count": len(self)}
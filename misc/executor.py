@@ -0,0 +1,177 @@
+import asyncio
+import logging
+
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable
+
+from misc.image import ImageCache, FontRegistry, GlyphAtlas
+
+import config
+
+
+class RenderQueueFull(asyncio.TimeoutError):
+    """
+    Raised when every worker is busy and the render queue is full, instead of waiting for a slot.
+    """
+
+
+class RenderExecutor:
+    pool: Executor = None
+    jobs: set[Future] = set()
+
+    metrics: dict = {
+        "peak_depth": 0,
+        "completed": 0,
+        "failed": 0,
+        "timeouts": 0,
+        "rejected": 0
+    }
+
+    def __init__(self) -> None:
+        """
+        Initializes a RenderExecutor instance with the configured pool settings.
+        """
+
+        self.kind: str = config.RENDER_EXECUTOR
+        self.workers: int = config.RENDER_WORKERS
+        self.queue: int = config.RENDER_QUEUE
+        self.timeout: float = config.RENDER_TIMEOUT
+
+    @staticmethod
+    def warm_up() -> None:
+        """
+        Loads image templates, fonts and glyph atlases in a freshly started worker process.
+        """
+
+        ImageCache().load()
+        FontRegistry().load()
+        GlyphAtlas.load()
+
+    def create(self) -> None:
+        """
+        Creates the worker pool.
+        """
+
+        if self.kind == "process":
+            RenderExecutor.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self.warm_up)
+        else:
+            RenderExecutor.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+
+        logging.info("Render executor created: %s, %d workers" % (self.kind, self.workers))
+
+    @staticmethod
+    def shutdown() -> None:
+        """
+        Stops the worker pool, dropping the jobs that have not started yet.
+        """
+
+        if RenderExecutor.pool:
+            RenderExecutor.pool.shutdown(wait=False, cancel_futures=True)
+            RenderExecutor.pool = None
+
+    @property
+    def depth(self) -> int:
+        """
+        Property method to retrieve the number of render jobs waiting or running in the pool.
+
+        Jobs whose caller has timed out keep counting until the worker has finished them.
+
+        Returns:
+            int: The current queue depth.
+        """
+
+        return len(self.jobs)
+
+    @property
+    def running(self) -> int:
+        """
+        Property method to retrieve the number of render jobs a worker has started.
+
+        Returns:
+            int: The number of running jobs, at most the number of workers.
+        """
+
+        # a process pool marks the jobs handed to its call queue as running, one more than the workers
+        return min(sum(1 for job in list(self.jobs) if job.running()), self.workers)
+
+    def _submit(self, func: Callable, *args: Any) -> Future:
+        """
+        Hands the function to the worker pool if a slot is free.
+
+        The slot is held until the job is done in the pool, not until its caller stops waiting.
+
+        Args:
+            func (Callable): The render function, picklable when a process pool is used.
+            *args (Any): The arguments passed to the function.
+
+        Returns:
+            Future: The job in the worker pool.
+
+        Raises:
+            RenderQueueFull: If every worker is busy and the queue is full.
+        """
+
+        if self.depth >= self.workers + self.queue:
+            self.metrics["rejected"] += 1
+            raise RenderQueueFull("Render queue is full, depth %d" % self.depth)
+
+        job = self.pool.submit(func, *args)
+        self.jobs.add(job)
+        job.add_done_callback(self.jobs.discard)
+
+        self.metrics["peak_depth"] = max(self.metrics["peak_depth"], self.depth)
+        return job
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """
+        Runs a render job off the event loop, bounded by the queue size and the job timeout.
+
+        Args:
+            func (Callable): The render function, picklable when a process pool is used.
+            *args (Any): The arguments passed to the function.
+
+        Returns:
+            Any: The result of the function.
+
+        Raises:
+            RenderQueueFull: If every worker is busy and the queue is full.
+            asyncio.TimeoutError: If the job has not finished within the timeout, queue wait included.
+        """
+
+        if not self.pool:
+            self.create()
+
+        job = self._submit(func, *args)
+
+        try:
+            # a job still queued in the pool is cancelled on timeout, a running one finishes in the worker
+            result = await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            logging.warning("Render job %s timed out, queue depth %d" % (func.__qualname__, self.depth))
+            raise
+        except Exception:
+            self.metrics["failed"] += 1
+            raise
+
+        self.metrics["completed"] += 1
+        return result
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Collects the queue depth and job counters of the executor.
+
+        Returns:
+            dict: The executor kind and its metrics.
+        """
+
+        executor = cls()
+
+        return {
+            "executor": config.RENDER_EXECUTOR,
+            "workers": config.RENDER_WORKERS,
+            "queued": executor.depth - executor.running,
+            "running": executor.running,
+            **cls.metrics
+        }
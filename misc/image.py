@@ -1,50 +1,706 @@
 import os
+import json
+import math
+import mmap
 import base64
+import struct
+import logging
 
 from typing import Literal
 
 from PIL import Image, ImageFont, ImageDraw
 from io import BytesIO
 
+from misc.cache import LRUCache
+
+import config
+
+
+class ImagePack:
+    mapping: mmap.mmap | None = None
+    index: dict = {}
+    start: int = 0
+
+    magic: bytes = b"MONOPACK"
+    header: struct.Struct = struct.Struct("<8sI")
+
+    def __init__(self) -> None:
+        """
+        Initializes an ImagePack instance with the default templates directory and pack file.
+        """
+
+        self.path: str = os.path.join(os.getcwd(), "misc", "images")
+        self.file: str = os.path.join(os.getcwd(), "misc", "images.pack")
+
+    @property
+    def templates(self) -> list[str]:
+        """
+        Property method to list the template files packed into the pack file.
+
+        Returns:
+            list[str]: The template file names.
+        """
+
+        return sorted(file for file in os.listdir(self.path) if file.endswith(".png"))
+
+    @property
+    def stale(self) -> bool:
+        """
+        Property method to check whether the pack file is missing or older than a template.
+
+        Returns:
+            bool: True if the pack file has to be built.
+        """
+
+        if not os.path.exists(self.file):
+            return True
+
+        built = os.path.getmtime(self.file)
+        return any(os.path.getmtime(os.path.join(self.path, file)) > built for file in self.templates)
+
+    def build(self) -> None:
+        """
+        Decodes every template to raw RGBA and writes them into the pack file after a JSON index.
+
+        The pixel data starts on a page boundary, so the mapped images are page aligned.
+        """
+
+        index, blobs, offset = {}, [], 0
+        for file in self.templates:
+            image = Image.open(os.path.join(self.path, file)).convert('RGBA')
+            blobs.append(image.tobytes())
+
+            index[file] = (offset, image.width, image.height)
+            offset += len(blobs[-1])
+
+        index = json.dumps(index).encode("utf-8")
+        start = -(-(self.header.size + len(index)) // mmap.PAGESIZE) * mmap.PAGESIZE
+
+        with open(self.file + ".tmp", "wb") as pack:
+            pack.write(self.header.pack(self.magic, len(index)))
+            pack.write(index)
+            pack.write(bytes(start - self.header.size - len(index)))
+            pack.writelines(blobs)
+
+        os.replace(self.file + ".tmp", self.file)
+        logging.info("Image pack built: %d templates, %d bytes" % (len(blobs), start + offset))
+
+    def update(self) -> None:
+        """
+        Builds the pack file if it is missing or stale.
+        """
+
+        if self.stale:
+            self.build()
+
+    def open(self) -> bool:
+        """
+        Maps the pack file into memory, shared with every process mapping the same file.
+
+        Returns:
+            bool: True if the pack file is mapped, False if it is missing or invalid.
+        """
+
+        if ImagePack.mapping:
+            return True
+
+        if not os.path.exists(self.file):
+            return False
+
+        with open(self.file, "rb") as pack:
+            mapping = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, length = self.header.unpack_from(mapping)
+        if magic != self.magic:
+            mapping.close()
+            logging.warning("Image pack %s is invalid, templates are decoded from PNG" % self.file)
+            return False
+
+        ImagePack.index = json.loads(mapping[self.header.size:self.header.size + length])
+        ImagePack.start = -(-(self.header.size + length) // mmap.PAGESIZE) * mmap.PAGESIZE
+        ImagePack.mapping = mapping
+
+        return True
+
+    def get(self, file: str) -> Image.Image | None:
+        """
+        Retrieves a read-only RGBA template backed directly by the mapped pack file.
+
+        Args:
+            file (str): The file name of the template.
+
+        Returns:
+            Image.Image | None: The template or None if it is not packed.
+        """
+
+        entry = self.index.get(file)
+        if not entry or not self.mapping:
+            return
+
+        offset, width, height = entry
+        offset += self.start
+
+        data = memoryview(self.mapping)[offset:offset + width * height * 4]
+        return Image.frombuffer("RGBA", (width, height), data, "raw", "RGBA", 0, 1)
+
+
+class ImageCache:
+    # decoded and composed images, which take private memory and are capped by IMAGE_CACHE_LIMIT
+    storage: LRUCache = LRUCache(
+        config.IMAGE_CACHE_LIMIT * 1024 ** 2,
+        weigher=lambda image: image.width * image.height * len(image.getbands())
+    )
+
+    # templates backed by the mapped image pack, which take no private memory and are never evicted
+    packed: dict = {}
+
+    def __init__(self) -> None:
+        """
+        Initializes an ImageCache instance with the default templates directory.
+        """
+
+        self.path: str = os.path.join(os.getcwd(), "misc", "images")
+
+    def load(self) -> None:
+        """
+        Loads every template from the images directory into the cache, mapping the image pack if enabled.
+        """
+
+        if config.IMAGE_PACK:
+            ImagePack().open()
+
+        for file in sorted(os.listdir(self.path)):
+            if file.endswith(".png"):
+                self.get(file)
+
+        logging.info("Image templates loaded: %d packed, %d decoded in %d bytes" % (
+            len(self.packed), len(self.storage), self.storage.weight
+        ))
+
+    def get(self, file: str) -> Image.Image:
+        """
+        Retrieves the decoded RGBA template, taking it from the image pack or decoding it on a cache miss.
+
+        The returned image is shared between all callers and must not be modified in place.
+
+        Args:
+            file (str): The file name of the template.
+
+        Returns:
+            Image.Image: The decoded template.
+        """
+
+        image = self.packed.get(file)
+        if image is not None:
+            return image
+
+        image = self.storage.get(file)
+        if image is None:
+            image = ImagePack().get(file)
+            if image is not None:
+                self.packed[file] = image
+                return image
+
+            image = Image.open(os.path.join(self.path, file)).convert('RGBA')
+            self.storage.set(file, image)
+
+        return image
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Collects the usage counters of the cache.
+
+        Returns:
+            dict: The counters of the decoded and composed images and the number of packed templates.
+        """
+
+        return {
+            **cls.storage.stats,
+            "packed": len(cls.packed)
+        }
+
+    def compose(self, file: str, layers: tuple) -> Image.Image:
+        """
+        Retrieves the template with static layers pasted on it, composing it on a cache miss.
+
+        The returned image is shared between all callers and must not be modified in place.
+
+        Args:
+            file (str): The file name of the base template.
+            layers (tuple): Pairs of layer template file name and position (x, y), pasted in order.
+
+        Returns:
+            Image.Image: The composed template.
+        """
+
+        key = (file, layers)
+
+        image = self.storage.get(key)
+        if image is None:
+            image = self.get(file).copy()
+            for layer, pos in layers:
+                layer = self.get(layer)
+                image.paste(layer, pos, layer)
+
+            self.storage.set(key, image)
+
+        return image
+
+
+class FontRegistry:
+    storage: dict = {}
+    loads: int = 0
+    avoided: int = 0
+
+    # faces and sizes drawn by the account and QR images
+    preload: tuple = (
+        ("Montserrat-SemiBold.ttf", 120),
+        ("Montserrat-Medium.ttf", 26),
+        ("Montserrat-Regular.ttf", 24),
+        ("Montserrat-Regular.ttf", 23),
+        ("Montserrat-Regular.ttf", 12)
+    )
+
+    def __init__(self) -> None:
+        """
+        Initializes a FontRegistry instance with the default fonts directory.
+        """
+
+        self.path: str = os.path.join(os.getcwd(), "misc", "fonts")
+
+    def load(self) -> None:
+        """
+        Loads the known font faces and sizes into the registry.
+        """
+
+        for font, size in self.preload:
+            self.get(font, size)
+
+        logging.info("Fonts loaded: %d" % len(self.storage))
+
+    def get(self, font: str, size: int) -> ImageFont.FreeTypeFont:
+        """
+        Retrieves the font object for the face and size, loading it on the first request.
+
+        Args:
+            font (str): The font file name.
+            size (int): The font size.
+
+        Returns:
+            ImageFont.FreeTypeFont: The loaded font object.
+        """
+
+        key = (font, size)
+        font_object = self.storage.get(key)
+
+        if font_object:
+            FontRegistry.avoided += 1
+            return font_object
+
+        font_object = ImageFont.truetype(os.path.join(self.path, font), size)
+        FontRegistry.loads += 1
+        self.storage[key] = font_object
+
+        return font_object
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Collects the usage counters of the registry.
+
+        Returns:
+            dict: The number of loaded fonts, performed loads and avoided loads.
+        """
+
+        return {
+            "fonts": len(cls.storage),
+            "loads": cls.loads,
+            "avoided": cls.avoided
+        }
+
+
+class GlyphAtlas:
+    storage: dict = {}
+
+    # characters of formatted amounts, see AccountImage.int_display
+    charset: str = "0123456789 .-₴$€"
+
+    # faces and sizes of the balance and credit lines
+    preload: tuple = (
+        ("Montserrat-SemiBold.ttf", 120),
+        ("Montserrat-Regular.ttf", 23)
+    )
+
+    # horizontal subpixel positions each glyph is rasterized at
+    phases: int = 4
+
+    def __init__(self, font: str, size: int) -> None:
+        """
+        Initializes a GlyphAtlas instance by rasterizing the character set once for the font and size.
+
+        Args:
+            font (str): The font file name.
+            size (int): The font size.
+        """
+
+        self.font = FontRegistry().get(font, size)
+
+        self.advances: dict = {char: self.font.getlength(char) for char in self.charset}
+        self.kerning: dict = {}
+        self.glyphs: dict = {}
+
+        for char in self.charset:
+            left, top, right, bottom = self.font.getbbox(char)
+            if right <= left or bottom <= top:
+                continue
+
+            for phase in range(self.phases):
+                # one spare column for the subpixel shift
+                mask = Image.new("L", (right - left + 1, bottom - top))
+                ImageDraw.Draw(mask).text((phase / self.phases - left, -top), char, 255, font=self.font)
+                self.glyphs[char, phase] = (mask, left, top)
+
+        for first in self.charset:
+            for second in self.charset:
+                pair = self.font.getlength(first + second) - self.advances[first] - self.advances[second]
+                if pair:
+                    self.kerning[first, second] = pair
+
+    @classmethod
+    def load(cls) -> None:
+        """
+        Builds the atlases for the known faces and sizes.
+        """
+
+        for font, size in cls.preload:
+            cls.storage[font, size] = cls(font, size)
+
+        logging.info("Glyph atlases built: %d" % len(cls.storage))
+
+    @classmethod
+    def get(cls, font: str, size: int, text: str) -> "GlyphAtlas | None":
+        """
+        Retrieves the atlas of the font and size if it covers every character of the text.
+
+        Args:
+            font (str): The font file name.
+            size (int): The font size.
+            text (str): The text to be drawn.
+
+        Returns:
+            GlyphAtlas | None: The atlas or None if the text has to be rasterized.
+        """
+
+        atlas = cls.storage.get((font, size))
+        if atlas and set(text) <= set(cls.charset):
+            return atlas
+
+    def layout(self, text: str) -> list[tuple[str, float]]:
+        """
+        Places the characters of the text along the baseline, applying pair kerning.
+
+        Args:
+            text (str): The text to be laid out.
+
+        Returns:
+            list[tuple[str, float]]: The characters and their pen positions.
+        """
+
+        pen, previous, placed = 0.0, None, []
+        for char in text:
+            pen += self.kerning.get((previous, char), 0)
+            placed.append((char, pen))
+
+            pen += self.advances[char]
+            previous = char
+
+        return placed
+
+    def width(self, text: str) -> float:
+        """
+        Measures the right edge of the text, like the right edge of ImageDraw.textbbox at the origin.
+
+        Args:
+            text (str): The text to be measured.
+
+        Returns:
+            float: The width of the text.
+        """
+
+        return max(
+            (pen + self.font.getbbox(char)[2] for char, pen in self.layout(text)),
+            default=0
+        )
+
+    def draw(self, image: Image.Image, pos: tuple, text: str, color: tuple) -> None:
+        """
+        Blits the glyphs of the text onto the image.
+
+        Args:
+            image (Image.Image): The image to draw on.
+            pos (tuple): The position (x, y) of the top-left corner, like ImageDraw.text.
+            color (tuple): The RGB color tuple.
+        """
+
+        x, y = pos
+        color = tuple(color) + (255,) * (4 - len(color))
+
+        for char, pen in self.layout(text):
+            origin = x + pen
+            phase = round((origin - int(origin)) * self.phases)
+
+            glyph = self.glyphs.get((char, phase % self.phases))
+            if not glyph:
+                continue
+
+            mask, left, top = glyph
+            image.paste(color, (int(origin) + phase // self.phases + left, int(y) + top), mask)
+
+
+class ImageEncoder:
+
+    def __init__(
+            self,
+            image_format: str = None,
+            quality: int = None,
+            compress_level: int = None,
+            optimize: bool = None
+    ) -> None:
+        """
+        Initializes an ImageEncoder instance, falling back to the configured settings.
+
+        Args:
+            image_format (str, optional): The output format: PNG, WEBP or JPEG.
+            quality (int, optional): The quality of lossy formats, 1-100.
+            compress_level (int, optional): The PNG zlib level 0-9, or the WEBP method 0-6.
+            optimize (bool, optional): Whether the encoder makes an extra pass to shrink the output.
+        """
+
+        self.format: str = (image_format or config.IMAGE_FORMAT).upper()
+        self.quality: int = quality if quality is not None else config.IMAGE_QUALITY
+        self.compress_level: int = compress_level if compress_level is not None else config.IMAGE_COMPRESS_LEVEL
+        self.optimize: bool = optimize if optimize is not None else config.IMAGE_OPTIMIZE
+
+    @property
+    def options(self) -> dict:
+        """
+        Property method to build the Pillow save options for the format.
+
+        Returns:
+            dict: The keyword arguments for Image.save.
+        """
+
+        if self.format == "PNG":
+            return {"compress_level": self.compress_level, "optimize": self.optimize}
+
+        if self.format == "WEBP":
+            return {"quality": self.quality, "method": min(self.compress_level, 6)}
+
+        return {"quality": self.quality, "optimize": self.optimize}
+
+    def encode(self, image: Image.Image) -> bytes:
+        """
+        Encodes the image, dropping the alpha channel for formats without one.
+
+        Args:
+            image (Image.Image): The image to be encoded.
+
+        Returns:
+            bytes: The encoded image, taken from the output buffer without copying.
+        """
+
+        if self.format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        buffered = BytesIO()
+        image.save(buffered, format=self.format, **self.options)
+
+        return buffered.getvalue()
+
+    def __str__(self) -> str:
+        """
+        Returns the encoder settings as a string.
+
+        Returns:
+            str: The format and its save options.
+        """
+
+        return "%s %s" % (self.format, self.options)
+
 
 class ImageProcess:
     
-    def __init__(self, file: str | bytes) -> None:
+    def __init__(self, file: str | bytes | Image.Image) -> None:
         """
-        Initializes an ImageProcess instance with the given file path or bytes.
+        Initializes an ImageProcess instance with the given file path, bytes or shared image.
+
+        Templates and shared images are copied only on the first mutable access to the image.
 
         Args:
-            file (str | bytes): The file path or bytes of the image.
+            file (str | bytes | Image.Image): The file path, bytes or shared RGBA image.
         """
 
         self.path: str = os.path.join(os.getcwd(), "misc")
         
-        if isinstance(file, bytes):
-            file = BytesIO(base64.b64decode(file))
+        if isinstance(file, Image.Image):
+            self._image = file
+            self.shared = True
+        elif isinstance(file, bytes):
+            self._image = Image.open(BytesIO(base64.b64decode(file))).convert('RGBA')
+            self.shared = False
         else:
-            file = os.path.join(self.path, "images", file)
-            
-        self.image = Image.open(file).convert('RGBA')
+            self._image = ImageCache().get(file)
+            self.shared = True
+
+        # pending affine transformation, mapping output pixels to source pixels
+        self.matrix: tuple | None = None
+        self.size: tuple = self._image.size
+
+        self.encoder: ImageEncoder = ImageEncoder()
+
+    @property
+    def image(self) -> Image.Image:
+        """
+        Property method to retrieve the image for modification, copying a shared template first.
+
+        Returns:
+            Image.Image: The image owned by this instance.
+        """
+
+        self._apply()
+
+        if self.shared:
+            self._image = self._image.copy()
+            self.shared = False
+
+        return self._image
+
+    @image.setter
+    def image(self, image: Image.Image) -> None:
+        """
+        Replaces the image owned by this instance.
+
+        Args:
+            image (Image.Image): The new image.
+        """
+
+        self._image = image
+        self.shared = False
+
+        self.matrix = None
+        self.size = image.size
+
+    @property
+    def source(self) -> Image.Image:
+        """
+        Property method to retrieve the image for reading only, without copying a shared template.
+
+        Returns:
+            Image.Image: The current image, which must not be modified in place.
+        """
+
+        self._apply()
+        return self._image
+
+    @staticmethod
+    def _compose(outer: tuple, inner: tuple) -> tuple:
+        """
+        Composes two affine matrices so that the result maps a point through inner first, then outer.
+
+        Args:
+            outer (tuple): The matrix of the earlier transformation.
+            inner (tuple): The matrix of the later transformation.
+
+        Returns:
+            tuple: The composed matrix.
+        """
+
+        a1, b1, c1, d1, e1, f1 = outer
+        a2, b2, c2, d2, e2, f2 = inner
+
+        return (
+            a1 * a2 + b1 * d2, a1 * b2 + b1 * e2, a1 * c2 + b1 * f2 + c1,
+            d1 * a2 + e1 * d2, d1 * b2 + e1 * e2, d1 * c2 + e1 * f2 + f1
+        )
+
+    def _transform(self, size: tuple, matrix: tuple) -> None:
+        """
+        Records an affine transformation, composing it with the pending ones.
+
+        Args:
+            size (tuple): The image size after the transformation.
+            matrix (tuple): The matrix mapping output pixels to pixels before the transformation.
+        """
+
+        self.matrix = self._compose(self.matrix, matrix) if self.matrix else matrix
+        self.size = size
+
+    def _apply(self) -> None:
+        """
+        Applies the pending transformations to the image in a single resampling pass.
+        """
+
+        if not self.matrix:
+            return
+
+        self._image = self._image.transform(self.size, Image.AFFINE, self.matrix, Image.BICUBIC)
+        self.shared = False
+        self.matrix = None
 
     def perspective(self, mv: float) -> None:
         """
         Applies a perspective transformation to the image.
 
+        The transformation is deferred until the image is next accessed.
+
         Args:
             mv (float): The perspective transformation factor.
         """
 
-        width, height = self.image.size
+        width, height = self.size
 
         xshift = mv * width
         new_width = width + int(round(abs(xshift)))
 
         transform_matrix = (1, mv, -xshift if mv > 0 else 0, 0, 1, 0)
 
-        self.image = self.image.transform(
-            (new_width, height),
-            Image.AFFINE, transform_matrix, Image.BICUBIC
-        )
+        self._transform((new_width, height), transform_matrix)
+
+    def rotate(self, angle: float, expand: bool = False) -> None:
+        """
+        Rotates the image counter clockwise around its center, matching Image.rotate.
+
+        The rotation is deferred until the image is next accessed.
+
+        Args:
+            angle (float): The rotation angle in degrees.
+            expand (bool, optional): Whether to enlarge the image to hold the whole rotated image. Defaults to False.
+        """
+
+        width, height = self.size
+        angle = -math.radians(angle % 360)
+
+        a, b = round(math.cos(angle), 15), round(math.sin(angle), 15)
+        d, e = -b, a
+
+        center_x, center_y = width / 2.0, height / 2.0
+        c = a * -center_x + b * -center_y + center_x
+        f = d * -center_x + e * -center_y + center_y
+
+        if expand:
+            corners = [
+                (a * x + b * y + c, d * x + e * y + f)
+                for x, y in ((0, 0), (width, 0), (width, height), (0, height))
+            ]
+            new_width = math.ceil(max(x for x, _ in corners)) - math.floor(min(x for x, _ in corners))
+            new_height = math.ceil(max(y for _, y in corners)) - math.floor(min(y for _, y in corners))
+
+            shift_x, shift_y = -(new_width - width) / 2.0, -(new_height - height) / 2.0
+            c, f = a * shift_x + b * shift_y + c, d * shift_x + e * shift_y + f
+            width, height = new_width, new_height
+
+        self._transform((width, height), (a, b, c, d, e, f))
 
     def add_text(
             self,
@@ -68,8 +724,17 @@ class ImageProcess:
         """
 
         _, ph = pos
+
+        atlas = GlyphAtlas.get(font, size, text)
+        if atlas:
+            if align == "center":
+                pos = ((self.image.width - atlas.width(text)) / 2, ph)
+
+            atlas.draw(self.image, pos, text, color)
+            return
+
         draw = ImageDraw.Draw(self.image)
-        font = ImageFont.truetype(os.path.join(self.path, "fonts", font), size)
+        font = FontRegistry().get(font, size)
         
         if align == "center":
             w, h = self.image.size
@@ -80,13 +745,10 @@ class ImageProcess:
         
     def __bytes__(self) -> bytes:
         """
-        Converts the image to bytes.
+        Converts the image to bytes with the instance encoder.
 
         Returns:
             bytes: The image bytes.
         """
         
-        buffered = BytesIO()
-        self.image.save(buffered, format="PNG", quality=95)
-        
-        return buffered.getvalue()[:]
+        return self.encoder.encode(self.source)
@@ -2,3 +2,5 @@ from . import check_proto
 from . import client_info
 from . import exchange_token
 from . import roll_in
+from . import statement
+from . import webhook
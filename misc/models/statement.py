@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from pydantic import BaseModel
+
+
+class StatementItem(BaseModel):
+    id: str
+    time: int
+    description: str
+    mcc: int
+    originalMcc: int | None = None
+    hold: bool
+    amount: int
+    operationAmount: int
+    currencyCode: int
+    commissionRate: int
+    cashbackAmount: int
+    balance: int
+    comment: str | None = None
+    receiptId: str | None = None
+    invoiceId: str | None = None
+    counterEdrpou: str | None = None
+    counterIban: str | None = None
+    counterName: str | None = None
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from pydantic import BaseModel
+
+from misc.models.statement import StatementItem
+
+
+class Data(BaseModel):
+    account: str
+    statementItem: StatementItem
+
+
+class Model(BaseModel):
+    type: str
+    data: Data = None
@@ -1,56 +1,472 @@
+import time
+import random
 import asyncio
+import hashlib
+import logging
 import aiohttp
 
+from time import monotonic
+from types import SimpleNamespace
+from itertools import count
+
 from aiogram import types
 from aiohttp import ClientResponse
 
 from misc import models
 
 from misc.other import Other
+from misc.cache import SingleFlight
+from misc.redis_storage import RedisStorage
+from misc.codec import Codec
 
 from decorators import async_timer
 
+import config
+
+
+class TokenBucket:
+
+    def __init__(self, capacity: int, refill: float) -> None:
+        """
+        Initializes a full TokenBucket instance.
+
+        Args:
+            capacity (int): The number of calls that can be made in a burst.
+            refill (float): The time in seconds it takes to regain one call.
+        """
+
+        self.capacity = capacity
+        self.refill = refill
+
+        self.tokens: float = capacity
+        self.updated: float = monotonic()
+
+    def _update(self, now: float) -> None:
+        """
+        Adds the budget regained since the last update, up to the capacity.
+
+        Args:
+            now (float): The current monotonic time.
+        """
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.refill)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Computes the time until a call can be made.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            float: The delay in seconds, 0 if a call can be made right away.
+        """
+
+        self._update(now)
+        return max(0., (1 - self.tokens) * self.refill)
+
+    def take(self) -> None:
+        """
+        Spends the budget of one call, see delay for when a call can be made.
+        """
+
+        self.tokens -= 1
+
+    def drain(self) -> None:
+        """
+        Spends the remaining budget, so the following calls wait for a refill.
+        """
+
+        self.tokens = min(self.tokens, 0.)
+
+    def full(self, now: float) -> bool:
+        """
+        Checks whether the budget has refilled completely.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            bool: True if a burst of the full capacity can be made, False otherwise.
+        """
+
+        self._update(now)
+        return self.tokens >= self.capacity
+
+
+class RequestScheduler:
+    INTERACTIVE: int = 0
+    BACKGROUND: int = 1
+
+    buckets: dict = {}
+    waiting: list = []
+    sequence = count()
+
+    loop_task: asyncio.Task = None
+    wake: asyncio.Event = None
+
+    metrics: dict = {
+        "granted": 0,
+        "queue_timeouts": 0,
+        "wait_total": 0.,
+        "wait_max": 0.,
+        "retries": 0,
+        "throttled": 0,
+        "server_errors": 0,
+        "timeouts": 0
+    }
+
+    @classmethod
+    def _bucket(cls, scope: str, key: str) -> TokenBucket:
+        """
+        Retrieves the budget of a token or an endpoint, creating it full on first use.
+
+        Budgets that have refilled completely are dropped first when there are too many of them,
+        as a new full bucket behaves the same.
+
+        Args:
+            scope (str): Either "token" or "endpoint".
+            key (str): The token or the endpoint.
+
+        Returns:
+            TokenBucket: The budget.
+        """
+
+        bucket = cls.buckets.get((scope, key))
+        if bucket:
+            return bucket
+
+        if len(cls.buckets) >= 1024:
+            now = monotonic()
+            for name in [name for name, bucket in cls.buckets.items() if bucket.full(now)]:
+                del cls.buckets[name]
+
+        if scope == "token":
+            bucket = TokenBucket(config.MONO_TOKEN_BUDGET, config.MONO_TOKEN_REFILL)
+        else:
+            bucket = TokenBucket(config.MONO_ENDPOINT_BUDGET, config.MONO_ENDPOINT_REFILL)
+
+        cls.buckets[(scope, key)] = bucket
+        return bucket
+
+    @classmethod
+    def _buckets_for(cls, endpoint: str, token: str) -> tuple:
+        """
+        Retrieves every budget a call has to fit in.
+
+        Args:
+            endpoint (str): The API method called.
+            token (str): The token the call is made with, if any.
+
+        Returns:
+            tuple: The budget of the endpoint, followed by the budget of the token if one is given.
+        """
+
+        if not token:
+            return cls._bucket("endpoint", endpoint),
+
+        return cls._bucket("endpoint", endpoint), cls._bucket("token", token)
+
+    @classmethod
+    async def acquire(cls, endpoint: str, token: str, priority: int = INTERACTIVE) -> float:
+        """
+        Waits until the endpoint and the token both have budget for a call and spends it.
+
+        Waiting calls are granted in priority order, then in the order they arrived.
+
+        Args:
+            endpoint (str): The API method called.
+            token (str): The token the call is made with, if any.
+            priority (int, optional): INTERACTIVE or BACKGROUND. Defaults to INTERACTIVE.
+
+        Returns:
+            float: The time in seconds the call waited.
+
+        Raises:
+            asyncio.TimeoutError: If the call has waited longer than the queue timeout.
+        """
+
+        if not cls.loop_task or cls.loop_task.done():
+            cls.wake = asyncio.Event()
+            cls.loop_task = asyncio.ensure_future(cls._dispatch())
+
+        future = asyncio.get_running_loop().create_future()
+        cls.waiting.append((priority, next(cls.sequence), future, cls._buckets_for(endpoint, token), monotonic()))
+        cls.wake.set()
+
+        try:
+            return await asyncio.wait_for(future, config.MONO_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            cls.metrics["queue_timeouts"] += 1
+            logging.warning("Mono API call to %s waited over %.0f seconds" % (endpoint, config.MONO_QUEUE_TIMEOUT))
+            raise
+
+    @classmethod
+    async def _dispatch(cls) -> None:
+        """
+        Grants the waiting calls whose budgets allow it, then sleeps until a budget refills or a call arrives.
+        """
+
+        while True:
+            now = monotonic()
+            delays, remaining = [], []
+
+            for entry in sorted(cls.waiting, key=lambda e: e[:2]):
+                _, _, future, buckets, queued = entry
+                if future.done():
+                    continue
+
+                delay = max(bucket.delay(now) for bucket in buckets)
+                if delay:
+                    delays.append(delay)
+                    remaining.append(entry)
+                    continue
+
+                for bucket in buckets:
+                    bucket.take()
+
+                wait = now - queued
+                cls.metrics["granted"] += 1
+                cls.metrics["wait_total"] += wait
+                cls.metrics["wait_max"] = max(cls.metrics["wait_max"], wait)
+                future.set_result(wait)
+
+            cls.waiting = remaining
+
+            cls.wake.clear()
+            try:
+                await asyncio.wait_for(cls.wake.wait(), min(delays) if delays else None)
+            except asyncio.TimeoutError:
+                pass
+
+    @classmethod
+    def throttle(cls, endpoint: str, token: str) -> None:
+        """
+        Spends the budget of the token, or of the endpoint for calls without one, after a 429 response.
+
+        Args:
+            endpoint (str): The API method called.
+            token (str): The token the call was made with, if any.
+        """
+
+        cls.metrics["throttled"] += 1
+        cls._buckets_for(endpoint, token)[-1].drain()
+
+    @staticmethod
+    def backoff(attempt: int, retry_after: str = None) -> float:
+        """
+        Computes the jittered exponential delay before a retry.
+
+        Args:
+            attempt (int): The number of the failed attempt, starting at 0.
+            retry_after (str, optional): The Retry-After header of the response, in seconds.
+
+        Returns:
+            float: The delay in seconds, at least the one asked by the server.
+        """
+
+        delay = random.uniform(0, config.MONO_RETRY_BACKOFF * 2 ** attempt)
+
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+
+        return delay
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Collects the waiting calls and the queue wait and retry counters of the scheduler.
+
+        Returns:
+            dict: The number of waiting calls per priority and budgets tracked along with the counters.
+        """
+
+        granted = cls.metrics["granted"]
+
+        return {
+            "waiting_interactive": sum(1 for entry in cls.waiting if entry[0] == cls.INTERACTIVE),
+            "waiting_background": sum(1 for entry in cls.waiting if entry[0] == cls.BACKGROUND),
+            "budgets": len(cls.buckets),
+            "wait_avg": cls.metrics["wait_total"] / granted if granted else 0.,
+            **cls.metrics
+        }
+
 
 class MonoAPI:
     """Written specifically for Sominemo implementation"""
-    
+
+    session: aiohttp.ClientSession = None
+
+    metrics: dict = {
+        "requests": 0,
+        "connections_created": 0,
+        "connections_reused": 0,
+        "pool_waits": 0,
+        "dns_cache_hits": 0,
+        "dns_cache_misses": 0
+    }
+
     def __init__(self) -> None:
         """
-        Initializes a MonoAPI instance with default host and origin.
+        Initializes a MonoAPI instance with the configured API URL and the default origin.
         """
 
-        self.host: str = "api.mono.sominemo.com"
+        self.url: str = config.MONO_API_URL
         self.origin: str = "monoweb.app"
+
+    @classmethod
+    def _trace_config(cls) -> aiohttp.TraceConfig:
+        """
+        Builds the request tracing hooks counting connection reuse and DNS cache usage.
+
+        Returns:
+            aiohttp.TraceConfig: The tracing hooks of the pooled session.
+        """
+
+        def count(metric: str):
+            async def hook(_: aiohttp.ClientSession, __: SimpleNamespace, ___: object) -> None:
+                cls.metrics[metric] += 1
+            return hook
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(count("requests"))
+        trace_config.on_connection_create_end.append(count("connections_created"))
+        trace_config.on_connection_reuseconn.append(count("connections_reused"))
+        trace_config.on_connection_queued_start.append(count("pool_waits"))
+        trace_config.on_dns_cache_hit.append(count("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(count("dns_cache_misses"))
+        return trace_config
+
+    def create_session(self) -> None:
+        """
+        Creates the process-wide session with a keep-alive connection pool and a DNS cache.
+        """
+
+        connector = aiohttp.TCPConnector(
+            limit_per_host=config.MONO_POOL_LIMIT,
+            keepalive_timeout=config.MONO_KEEPALIVE,
+            ttl_dns_cache=config.MONO_DNS_TTL
+        )
+        timeout = aiohttp.ClientTimeout(
+            connect=config.MONO_CONNECT_TIMEOUT,
+            sock_read=config.MONO_READ_TIMEOUT
+        )
+
+        MonoAPI.session = aiohttp.ClientSession(
+            connector=connector, timeout=timeout, trace_configs=[self._trace_config()]
+        )
+        logging.info("Mono API session created: %d connections per host" % config.MONO_POOL_LIMIT)
+
+    @staticmethod
+    async def shutdown() -> None:
+        """
+        Closes the session along with its pooled connections.
+        """
+
+        if MonoAPI.session:
+            await MonoAPI.session.close()
+            MonoAPI.session = None
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Collects the connection pool usage of the session.
+
+        Returns:
+            dict: The open connections, busy and idle, along with the request and connection counters.
+        """
+
+        connector = cls.session.connector if cls.session else None
+        busy = len(getattr(connector, "_acquired", ()))
+        idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+
+        return {
+            "limit_per_host": config.MONO_POOL_LIMIT,
+            "busy": busy,
+            "idle": idle,
+            **cls.metrics
+        }
     
-    async def request(self, api_method: str, method: str = "GET", data: dict = None, token: str = "") -> \
-            ClientResponse.text or ClientResponse.json or None:
+    async def request(
+            self,
+            api_method: str,
+            method: str = "GET",
+            data: dict = None,
+            token: str = "",
+            priority: int = RequestScheduler.INTERACTIVE,
+            endpoint: str = None
+    ) -> ClientResponse.text or ClientResponse.json or None:
         """
         Makes an asynchronous request to the Mono API.
 
+        The request waits for the budgets of its endpoint and token, and is retried with a jittered backoff
+        after a timeout, 429 or 5xx response.
+
         Args:
             api_method (str): The specific API method to be called.
             method (str): The HTTP method for the request (default is "GET").
             data (dict): The data to be sent with the request (default is None).
             token (str): The token to be included in the request headers (default is "").
+            priority (int): The scheduling priority of the request (default is RequestScheduler.INTERACTIVE).
+            endpoint (str): The endpoint budget the request is counted against (default is the API method).
 
         Returns:
             ClientResponse.text or ClientResponse.json or None: The response body if successful, None otherwise.
         """
-        
-        async with aiohttp.ClientSession() as session:
+
+        if not self.session or self.session.closed:
+            self.create_session()
+
+        endpoint = endpoint or api_method
+
+        for attempt in range(config.MONO_RETRIES + 1):
             try:
-                async with session.request(method, url=f'https://{self.host}/{api_method}', headers={
-                    "Origin": f"https://{self.origin}",
-                    "Referer": f"https://{self.origin}/",
-                    "X-Request-Id": token
-                }, data=data) as response:
-                    body = await response.json() \
-                           if response.headers.get("content-type").split(";")[0] == "application/json" \
-                           else await response.text()
-                    return body if response.status == 200 else None
-            except (asyncio.TimeoutError, TypeError):
+                await RequestScheduler.acquire(endpoint, token, priority)
+            except asyncio.TimeoutError:
                 return {"error": None}
-            
+
+            retry_after = None
+            try:
+                status, body, retry_after = await self._send(api_method, method, data, token)
+            except asyncio.TimeoutError:
+                RequestScheduler.metrics["timeouts"] += 1
+                status, body = None, {"error": None}
+            except TypeError:
+                return {"error": None}
+
+            if status is not None and status != 429 and status < 500:
+                return body if status == 200 else None
+
+            if status == 429:
+                RequestScheduler.throttle(endpoint, token)
+            elif status is not None:
+                RequestScheduler.metrics["server_errors"] += 1
+
+            if attempt == config.MONO_RETRIES:
+                return body if status is None else None
+
+            RequestScheduler.metrics["retries"] += 1
+            await asyncio.sleep(RequestScheduler.backoff(attempt, retry_after))
+
+    async def _send(self, api_method: str, method: str, data: dict | None, token: str) -> tuple:
+        """
+        Sends a single request to the Mono API.
+
+        Returns:
+            tuple: The response status, the response body and the Retry-After header.
+        """
+
+        async with self.session.request(method, url=f'{self.url}/{api_method}', headers={
+            "Origin": f"https://{self.origin}",
+            "Referer": f"https://{self.origin}/",
+            "X-Request-Id": token
+        }, data=data) as response:
+            body = await response.json(loads=Codec.loads) \
+                   if response.headers.get("content-type").split(";")[0] == "application/json" \
+                   else await response.text()
+            return response.status, body, response.headers.get("Retry-After")
+
     async def check_proto(self) -> dict | None:
         """
         Sends a request to check the Mono API protocol and returns the response.
@@ -91,25 +507,67 @@ class MonoAPI:
         )
         return body
 
-    async def client_info(self, token: str) -> dict | None:
+    async def client_info(self, token: str, priority: int = RequestScheduler.INTERACTIVE) -> dict | None:
         """
         Sends a request to retrieve client information and returns the response.
 
         Args:
             token (str): The token for client information retrieval.
+            priority (int, optional): The scheduling priority. Defaults to RequestScheduler.INTERACTIVE.
 
         Returns:
             dict | None: The response body if successful, None otherwise.
         """
 
         body = await self.request(
-            "request/personal/client-info", "GET", token=token
+            "request/personal/client-info", "GET", token=token, priority=priority
+        )
+        return body
+
+    async def statement(
+            self,
+            token: str,
+            account: str,
+            time_from: int,
+            time_to: int,
+            priority: int = RequestScheduler.INTERACTIVE
+    ) -> list | dict | None:
+        """
+        Sends a request to retrieve the statement items of an account within a time range, newest first.
+
+        Args:
+            token (str): The token for statement retrieval.
+            account (str): The account id.
+            time_from (int): The start of the range, a Unix time.
+            time_to (int): The end of the range, a Unix time.
+            priority (int, optional): The scheduling priority. Defaults to RequestScheduler.INTERACTIVE.
+
+        Returns:
+            list | dict | None: The statement items if successful, None or an error otherwise.
+        """
+
+        body = await self.request(
+            f"request/personal/statement/{account}/{time_from}/{time_to}", "GET",
+            token=token, priority=priority, endpoint="request/personal/statement"
         )
         return body
 
 
 class Mono:
-    
+    flights: SingleFlight = SingleFlight()
+    revalidations: set = set()
+
+    metrics: dict = {
+        "fresh_hits": 0,
+        "stale_hits": 0,
+        "misses": 0,
+        "upstream_calls": 0,
+        "revalidations": 0,
+        "revalidation_errors": 0,
+        "pushes": 0,
+        "pushes_unmatched": 0
+    }
+
     @staticmethod
     @async_timer
     async def check_token(token: str) -> str | None:
@@ -160,6 +618,11 @@ class Mono:
         Asynchronously retrieves client information using the provided token and returns the result
         as a client_info model.
 
+        Cached client information is served as is while fresh, and served while refreshed in the background
+        once stale. Information kept up to date by statement webhooks stays fresh longer. Concurrent upstream
+        requests for the same token share a single request and its parsed model, each caller gets its own copy
+        with the name translated to its language.
+
         Args:
             message (types.Message): The message object for language translation.
             token (str): The token for client information retrieval.
@@ -167,8 +630,192 @@ class Mono:
         Returns:
             models.client_info.Model: The retrieved client information.
         """
-        
-        data = await MonoAPI().client_info(token)
-        model = models.client_info.Model(**data)
-        model.name = Other.name_translate(message.from_user.language_code, model.name)
+
+        model = await Mono.cached_client_info(message.chat.id, token)
+        return model.model_copy(update={
+            "name": Other.name_translate(message.from_user.language_code, model.name)
+        })
+
+    @staticmethod
+    async def cached_client_info(chat_id: int, token: str) -> models.client_info.Model:
+        """
+        Asynchronously retrieves the client information from the cache of the chat, or from upstream on a miss.
+
+        Args:
+            chat_id (int): The chat the client information is cached for.
+            token (str): The token for client information retrieval.
+
+        Returns:
+            models.client_info.Model: The client information, with the name as returned upstream.
+        """
+
+        meta, client = await RedisStorage().get_many([f"mono_client_meta_{chat_id}", f"mono_client_{chat_id}"])
+        meta = Codec.loads(meta) if meta and client else None
+
+        # An entry left by another token of the chat is a miss
+        if meta and meta["token"] == Mono._token_digest(token):
+            model = models.client_info.Model.model_validate_json(client)
+
+            fresh_ttl = config.WEBHOOK_FRESH_TTL if meta.get("pushed") else config.CLIENT_FRESH_TTL
+            if time.time() - meta["fetched"] < fresh_ttl:
+                Mono.metrics["fresh_hits"] += 1
+                return model
+
+            Mono.metrics["stale_hits"] += 1
+            Mono._revalidate(chat_id, token)
+            return model
+
+        Mono.metrics["misses"] += 1
+        return await Mono.refresh_client_info(chat_id, token)
+
+    @staticmethod
+    async def refresh_client_info(
+            chat_id: int,
+            token: str,
+            priority: int = RequestScheduler.INTERACTIVE
+    ) -> models.client_info.Model:
+        """
+        Asynchronously requests the client information from upstream and caches it for the chat.
+
+        Args:
+            chat_id (int): The chat the client information is cached for.
+            token (str): The token for client information retrieval.
+            priority (int, optional): The scheduling priority. Defaults to RequestScheduler.INTERACTIVE.
+
+        Returns:
+            models.client_info.Model: The client information, with the name as returned upstream.
+        """
+
+        model = await Mono.flights.do(token, lambda: Mono.fetch_client_info(token, priority))
+
+        await RedisStorage().set_many({
+            f"mono_client_meta_{chat_id}": Codec.dumps({"token": Mono._token_digest(token), "fetched": time.time()}),
+            f"mono_client_{chat_id}": model.model_dump_json()
+        }, ex=config.CLIENT_STALE_TTL)
+
+        # Lets the statement webhooks find the chat of an account
+        if config.WEBHOOK_ENABLED:
+            for account in model.accounts:
+                await RedisStorage().set(f"mono_account_{account.id}", str(chat_id), ex=config.CLIENT_STALE_TTL)
+
         return model
+
+    @staticmethod
+    def _revalidate(chat_id: int, token: str) -> None:
+        """
+        Refreshes the cached client information of the chat in the background.
+
+        Args:
+            chat_id (int): The chat the client information is cached for.
+            token (str): The token for client information retrieval.
+        """
+
+        async def revalidate() -> None:
+            try:
+                await Mono.refresh_client_info(chat_id, token, RequestScheduler.BACKGROUND)
+            except Exception as e:
+                Mono.metrics["revalidation_errors"] += 1
+                logging.warning("Client info revalidation failed: %s" % e)
+
+        Mono.metrics["revalidations"] += 1
+
+        task = asyncio.ensure_future(revalidate())
+        Mono.revalidations.add(task)
+        task.add_done_callback(Mono.revalidations.discard)
+
+    @staticmethod
+    async def apply_statement(account_id: str, balance: int) -> tuple | None:
+        """
+        Asynchronously updates the cached balance of the account from a statement webhook, in place.
+
+        The cached client information is marked as kept up to date, so it stays fresh for WEBHOOK_FRESH_TTL.
+
+        Args:
+            account_id (str): The account of the statement item.
+            balance (int): The balance after the statement item, in minor units.
+
+        Returns:
+            tuple | None: The account as it was cached before the update and the client name as returned upstream,
+                or None if the account is not cached.
+        """
+
+        chat_id = await RedisStorage().get(f"mono_account_{account_id}")
+        meta, client = await RedisStorage().get_many([f"mono_client_meta_{chat_id}", f"mono_client_{chat_id}"]) \
+            if chat_id else (None, None)
+
+        if not meta or not client:
+            Mono.metrics["pushes_unmatched"] += 1
+            return
+
+        meta, model = Codec.loads(meta), models.client_info.Model.model_validate_json(client)
+        accounts = [account for account in model.accounts if account.id == account_id]
+        if not accounts:
+            Mono.metrics["pushes_unmatched"] += 1
+            return
+
+        previous = accounts[0].model_copy()
+        accounts[0].balance = models.client_info.seperate_float(balance)
+        meta["pushed"] = time.time()
+
+        ttl = int(config.CLIENT_STALE_TTL - (time.time() - meta["fetched"]))
+        await RedisStorage().set_many({
+            f"mono_client_meta_{chat_id}": Codec.dumps(meta),
+            f"mono_client_{chat_id}": model.model_dump_json()
+        }, ex=max(ttl, 1))
+
+        Mono.metrics["pushes"] += 1
+        return previous, model.name
+
+    @staticmethod
+    async def forget_client_info(chat_id: int) -> list[str]:
+        """
+        Asynchronously drops the cached client information of the chat.
+
+        Args:
+            chat_id (int): The chat the client information is cached for.
+
+        Returns:
+            list[str]: The ids of the accounts the dropped client information listed.
+        """
+
+        client = await RedisStorage().get(f"mono_client_{chat_id}")
+        await RedisStorage().forget(f"mono_client_meta_{chat_id}")
+        await RedisStorage().forget(f"mono_client_{chat_id}")
+
+        return [account.id for account in models.client_info.Model.model_validate_json(client).accounts] \
+            if client else []
+
+    @staticmethod
+    def _token_digest(token: str) -> str:
+        """
+        Hashes a token, so the cached client information can be matched to it without storing the token.
+
+        Args:
+            token (str): The token.
+
+        Returns:
+            str: The first 16 hex digits of the SHA-256 digest.
+        """
+
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    async def fetch_client_info(
+            token: str,
+            priority: int = RequestScheduler.INTERACTIVE
+    ) -> models.client_info.Model:
+        """
+        Asynchronously requests and parses the client information, with the name as returned upstream.
+
+        Args:
+            token (str): The token for client information retrieval.
+            priority (int, optional): The scheduling priority. Defaults to RequestScheduler.INTERACTIVE.
+
+        Returns:
+            models.client_info.Model: The retrieved client information.
+        """
+
+        Mono.metrics["upstream_calls"] += 1
+
+        data = await MonoAPI().client_info(token, priority)
+        return models.client_info.Model(**data)
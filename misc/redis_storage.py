@@ -61,6 +61,38 @@ class RedisStorage:
 
         return await self.cursor.set(key, value, ex=ex)
 
+    @async_timer
+    async def get_many(self, keys: list[str]) -> list[str | None]:
+        """
+        Retrieves the values associated with the specified keys in a single round trip.
+
+        Args:
+            keys (list[str]): The keys to retrieve the values for.
+
+        Returns:
+            list[str | None]: The values in the order of the keys, None for the keys not found.
+        """
+
+        if not keys:
+            return []
+
+        return [data.decode("utf-8") if data else None for data in await self.cursor.mget(keys)]
+
+    @async_timer
+    async def set_many(self, mapping: dict, ex: int = None) -> None:
+        """
+        Sets the values associated with the specified keys in a single round trip.
+
+        Args:
+            mapping (dict): The values keyed by key.
+            ex (int): Optional. Expiry time for every key-value pair in seconds.
+        """
+
+        async with self.cursor.pipeline(transaction=True) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ex)
+            await pipe.execute()
+
     @async_timer
     async def forget(self, key: str) -> bool:
         """
@@ -74,3 +106,183 @@ class RedisStorage:
         """
 
         return await self.cursor.delete(key)
+
+    @async_timer
+    async def forget_many(self, keys: list[str]) -> int:
+        """
+        Deletes the specified key-value pairs from the Redis database in a single round trip.
+
+        Args:
+            keys (list[str]): The keys to delete from the Redis database.
+
+        Returns:
+            int: The number of keys deleted.
+        """
+
+        if not keys:
+            return 0
+
+        return await self.cursor.delete(*keys)
+
+    @async_timer
+    async def store_sorted(self, key: str, members: dict, values: dict, ex: int = None) -> int:
+        """
+        Stores values along with their members in a sorted index, replacing the values already stored.
+
+        The index is kept in the sorted set under the key and the values in the hash under "<key>_values".
+
+        Args:
+            key (str): The key of the sorted index.
+            members (dict): The scores keyed by member.
+            values (dict): The values keyed by member.
+            ex (int): Optional. Expiry time of the index and its values in seconds, renewed with every store.
+
+        Returns:
+            int: The number of members that were not in the index before.
+        """
+
+        async with self.cursor.pipeline(transaction=True) as pipe:
+            pipe.zadd(key, members).hset(f"{key}_values", mapping=values)
+            if ex:
+                pipe.expire(key, ex).expire(f"{key}_values", ex)
+
+            added, *_ = await pipe.execute()
+
+        return added
+
+    @async_timer
+    async def set_fields(self, key: str, mapping: dict, ex: int = None) -> None:
+        """
+        Sets fields of the hash under the specified key.
+
+        Args:
+            key (str): The key of the hash.
+            mapping (dict): The values keyed by field, str or bytes.
+            ex (int): Optional. Expiry time of the hash in seconds, renewed with every call.
+        """
+
+        if not mapping:
+            return
+
+        async with self.cursor.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=mapping)
+            if ex:
+                pipe.expire(key, ex)
+
+            await pipe.execute()
+
+    @async_timer
+    async def get_fields(self, key: str, fields: list[str]) -> list[bytes | None]:
+        """
+        Retrieves fields of the hash under the specified key as raw bytes, for binary values.
+
+        Args:
+            key (str): The key of the hash.
+            fields (list[str]): The fields to retrieve.
+
+        Returns:
+            list[bytes | None]: The values in the order of the fields, None for the fields not found.
+        """
+
+        if not fields:
+            return []
+
+        return await self.cursor.hmget(key, fields)
+
+    @async_timer
+    async def trim_fields(self, key: str, low: float) -> int:
+        """
+        Deletes the fields of the hash under the specified key whose names are numbers below the bound.
+
+        Args:
+            key (str): The key of the hash.
+            low (float): The lowest field name kept.
+
+        Returns:
+            int: The number of fields deleted.
+        """
+
+        fields = [field for field in await self.cursor.hkeys(key) if field.isdigit() and int(field) < low]
+        if not fields:
+            return 0
+
+        return await self.cursor.hdel(key, *fields)
+
+    @async_timer
+    async def add_members(self, key: str, members: list[str], ex: int = None) -> None:
+        """
+        Adds members to the set under the specified key.
+
+        Args:
+            key (str): The key of the set.
+            members (list[str]): The members to add.
+            ex (int): Optional. Expiry time of the set in seconds, renewed with every addition.
+        """
+
+        if not members:
+            return
+
+        async with self.cursor.pipeline(transaction=True) as pipe:
+            pipe.sadd(key, *members)
+            if ex:
+                pipe.expire(key, ex)
+
+            await pipe.execute()
+
+    @async_timer
+    async def get_members(self, key: str) -> list[str]:
+        """
+        Retrieves the members of the set under the specified key.
+
+        Args:
+            key (str): The key of the set.
+
+        Returns:
+            list[str]: The members, empty if the set is not found.
+        """
+
+        return [member.decode("utf-8") for member in await self.cursor.smembers(key)]
+
+    @async_timer
+    async def range_sorted(self, key: str, low: float, high: float, limit: int = None) -> list[str]:
+        """
+        Retrieves the values of a sorted index with scores within the bounds, highest score first.
+
+        Args:
+            key (str): The key of the sorted index.
+            low (float): The lowest score, included.
+            high (float): The highest score, included.
+            limit (int): Optional. The maximum number of values.
+
+        Returns:
+            list[str]: The values.
+        """
+
+        members = await self.cursor.zrevrangebyscore(key, high, low, start=0 if limit else None, num=limit)
+        if not members:
+            return []
+
+        values = await self.cursor.hmget(f"{key}_values", members)
+        return [value.decode("utf-8") for value in values if value]
+
+    @async_timer
+    async def trim_sorted(self, key: str, low: float) -> int:
+        """
+        Deletes the members of a sorted index, along with their values, with scores below the bound.
+
+        Args:
+            key (str): The key of the sorted index.
+            low (float): The lowest score kept.
+
+        Returns:
+            int: The number of members deleted.
+        """
+
+        members = await self.cursor.zrangebyscore(key, "-inf", f"({low}")
+        if not members:
+            return 0
+
+        async with self.cursor.pipeline(transaction=True) as pipe:
+            await pipe.zrem(key, *members).hdel(f"{key}_values", *members).execute()
+
+        return len(members)
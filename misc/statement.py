@@ -0,0 +1,339 @@
+import time
+import asyncio
+import logging
+
+from weakref import WeakValueDictionary
+from typing import AsyncIterator
+
+from misc.mono import MonoAPI, RequestScheduler
+from misc.redis_storage import RedisStorage
+from misc.codec import Codec
+from misc.columns import DayColumns, day_start
+from misc.models.statement import StatementItem
+
+import config
+
+
+class StatementSync:
+    locks: WeakValueDictionary = WeakValueDictionary()
+
+    metrics: dict = {
+        "syncs": 0,
+        "skipped": 0,
+        "requests": 0,
+        "items": 0,
+        "failures": 0,
+        "column_rebuilds": 0
+    }
+
+    def __init__(self, token: str, account: str, chat_id: int = None) -> None:
+        """
+        Initializes a StatementSync instance for an account.
+
+        Args:
+            token (str): The token for statement retrieval.
+            account (str): The account id.
+            chat_id (int, optional): The chat syncing the account, which it is listed for so the logout
+                of the chat can drop the statement. Defaults to None.
+        """
+
+        self.token = token
+        self.account = account
+        self.chat_id = chat_id
+        self.error: str | None = None
+
+        self.key: str = f"statement_{account}"
+        self.cursor_key: str = f"statement_cursor_{account}"
+        self.columns_key: str = f"statement_columns_{account}"
+
+    @property
+    async def cursor(self) -> int | None:
+        """
+        Property method to retrieve the time up to which the statement of the account is synced.
+
+        Returns:
+            int | None: The Unix time or None if the account has never been synced.
+        """
+
+        cursor = await RedisStorage().get(self.cursor_key)
+        return int(cursor) if cursor else None
+
+    @property
+    async def fresh(self) -> bool:
+        """
+        Property method to check whether the account has been synced within STATEMENT_SYNC_INTERVAL.
+
+        A completed sync moves the cursor to the time it started, so the cursor is the time of the last sync.
+
+        Returns:
+            bool: True if the stored statement is served without fetching, False otherwise.
+        """
+
+        cursor = await self.cursor
+        return cursor is not None and time.time() - cursor < config.STATEMENT_SYNC_INTERVAL
+
+    @staticmethod
+    def windows(start: int, end: int) -> list[tuple[int, int]]:
+        """
+        Splits a time range into the longest ranges a single statement request may span, oldest first.
+
+        Args:
+            start (int): The start of the range, a Unix time.
+            end (int): The end of the range, a Unix time.
+
+        Returns:
+            list[tuple[int, int]]: The start and end of every window.
+        """
+
+        return [(t, min(t + config.STATEMENT_WINDOW, end)) for t in range(start, end, config.STATEMENT_WINDOW)]
+
+    async def pages(self, priority: int = RequestScheduler.INTERACTIVE) -> AsyncIterator[list[StatementItem]]:
+        """
+        Fetches the statement items the storage is missing, yielding every page as soon as it is stored.
+
+        Nothing is fetched within STATEMENT_SYNC_INTERVAL of the last completed sync, otherwise only the range
+        after the cursor is fetched, a full history only on the first sync. Windows are
+        fetched oldest first and pages newest first within a window, and the cursor moves past a window
+        once all of its pages are stored, so an interrupted sync resumes from the first incomplete window.
+
+        Concurrent syncs of the same account run one after another, the later one fetching what is new since.
+        Callers that stop early should close the iterator, so the account is not left locked.
+
+        Args:
+            priority (int, optional): The scheduling priority. Defaults to RequestScheduler.INTERACTIVE.
+
+        Yields:
+            list[StatementItem]: The items of a page, newest first.
+        """
+
+        lock = self.locks.setdefault(self.account, asyncio.Lock())
+
+        async with lock:
+            try:
+                async for items in self._pages(priority):
+                    yield items
+            finally:
+                # Listed after the last write, so the list outlives the statement it points to
+                if self.chat_id is not None:
+                    await RedisStorage().add_members(
+                        f"statement_accounts_{self.chat_id}", [self.account], ex=config.STATEMENT_RETENTION
+                    )
+
+    async def _pages(self, priority: int) -> AsyncIterator[list[StatementItem]]:
+        """
+        Fetches and stores the missing statement items, see pages, which holds the lock of the account.
+
+        Args:
+            priority (int): The scheduling priority.
+
+        Yields:
+            list[StatementItem]: The items of a page, newest first.
+        """
+
+        await self._ensure_columns()
+
+        if await self.fresh:
+            self.metrics["skipped"] += 1
+            return
+
+        self.metrics["syncs"] += 1
+
+        now = int(time.time())
+        cursor = await self.cursor
+        start = max(cursor - config.STATEMENT_OVERLAP, now - config.STATEMENT_RETENTION) \
+            if cursor else now - config.STATEMENT_HISTORY
+
+        for window_from, window_to in self.windows(start, now):
+            page_to = window_to
+
+            while True:
+                self.metrics["requests"] += 1
+                try:
+                    items = await MonoAPI().statement(self.token, self.account, window_from, page_to, priority)
+                except asyncio.TimeoutError:
+                    items = "no request budget within the queue timeout"
+
+                if not isinstance(items, list):
+                    self.error = str(items)
+                    self.metrics["failures"] += 1
+                    logging.warning("Statement sync of %s stopped at %d: %s" % (self.account, page_to, items))
+                    return
+
+                items = [StatementItem(**item) for item in items]
+                if items:
+                    await self._store(items)
+                    yield items
+
+                if len(items) < config.STATEMENT_PAGE:
+                    break
+
+                # The next page ends at the oldest item, items sharing its second are deduplicated by id
+                oldest = min(item.time for item in items)
+                page_to = oldest if oldest < page_to else oldest - 1
+                if page_to < window_from:
+                    break
+
+            await RedisStorage().set(self.cursor_key, str(window_to), ex=config.STATEMENT_RETENTION)
+
+        await RedisStorage().trim_sorted(self.key, now - config.STATEMENT_RETENTION)
+        await RedisStorage().trim_fields(self.columns_key, day_start(now - config.STATEMENT_RETENTION))
+
+    async def _store(self, items: list[StatementItem]) -> int:
+        """
+        Asynchronously stores statement items and lays the days they fall on out as columns again,
+        renewing the expiry of the stored statement.
+
+        Every stored item is older than the retention by the time the statement expires,
+        so an account that is no longer synced does not stay in storage.
+
+        Args:
+            items (list[StatementItem]): The items to store.
+
+        Returns:
+            int: The number of items that were not stored before.
+        """
+
+        self.metrics["items"] += len(items)
+
+        added = await RedisStorage().store_sorted(
+            self.key,
+            {item.id: item.time for item in items},
+            {item.id: item.model_dump_json() for item in items},
+            ex=config.STATEMENT_RETENTION
+        )
+
+        times = [item.time for item in items]
+        await self._build_columns(day_start(min(times)), day_start(max(times), 1))
+        return added
+
+    async def _build_columns(self, low: int, high: int) -> None:
+        """
+        Asynchronously lays the stored items of the days within a range out as columns, one field per day.
+
+        The items are decoded here, once per sync, so summaries read the columns without decoding any.
+
+        Args:
+            low (int): The start of the first day.
+            high (int): The start of the day after the last one.
+        """
+
+        days = {}
+        for value in await RedisStorage().range_sorted(self.key, low, high - 1):
+            record = Codec.loads(value)
+            days.setdefault(day_start(record["time"]), []).append(record)
+
+        mapping = {str(day): DayColumns.build(records).to_bytes() for day, records in days.items()}
+        mapping["zone"] = config.SUMMARY_TIMEZONE
+
+        await RedisStorage().set_fields(self.columns_key, mapping, ex=config.STATEMENT_RETENTION)
+
+    async def _ensure_columns(self) -> bool:
+        """
+        Asynchronously lays the whole stored statement out as columns again if its days start in another
+        time zone than the configured one, or if it has been stored before the columns were.
+
+        Returns:
+            bool: True if the columns have been built again, False otherwise.
+        """
+
+        zone, = await RedisStorage().get_fields(self.columns_key, ["zone"])
+        if zone == config.SUMMARY_TIMEZONE.encode("utf-8"):
+            return False
+
+        self.metrics["column_rebuilds"] += 1
+
+        now = time.time()
+        await RedisStorage().forget(self.columns_key)
+        await self._build_columns(day_start(now - config.STATEMENT_RETENTION), day_start(now, 1))
+
+        return True
+
+    async def columns(self, starts: list[int]) -> list[DayColumns]:
+        """
+        Asynchronously retrieves the columns of the stored items of every day.
+
+        Args:
+            starts (list[int]): The start of every day followed by the end of the last one, see day_starts.
+
+        Returns:
+            list[DayColumns]: The columns of every day, empty for the days without items.
+        """
+
+        # Only a rebuild waits for a sync of the account in progress
+        zone, *values = await RedisStorage().get_fields(self.columns_key, ["zone"] + [str(s) for s in starts[:-1]])
+
+        if zone != config.SUMMARY_TIMEZONE.encode("utf-8"):
+            async with self.locks.setdefault(self.account, asyncio.Lock()):
+                await self._ensure_columns()
+
+            values = await RedisStorage().get_fields(self.columns_key, [str(start) for start in starts[:-1]])
+
+        return [DayColumns.from_bytes(value) if value else DayColumns.empty() for value in values]
+
+    async def sync(self, priority: int = RequestScheduler.BACKGROUND) -> int | None:
+        """
+        Asynchronously fetches the statement items the storage is missing.
+
+        Args:
+            priority (int, optional): The scheduling priority. Defaults to RequestScheduler.BACKGROUND.
+
+        Returns:
+            int | None: The number of items fetched, or None if the sync has stopped on an upstream error
+                and the stored statement is incomplete, see error.
+        """
+
+        fetched = 0
+        async for page in self.pages(priority):
+            fetched += len(page)
+
+        return None if self.error else fetched
+
+    async def history(self, since: int, until: int = None, limit: int = None) -> list[StatementItem]:
+        """
+        Asynchronously retrieves the stored statement items within a time range, newest first.
+
+        Args:
+            since (int): The start of the range, a Unix time.
+            until (int, optional): The end of the range, a Unix time. Defaults to now.
+            limit (int, optional): The maximum number of items. Defaults to None, all of them.
+
+        Returns:
+            list[StatementItem]: The statement items.
+        """
+
+        values = await RedisStorage().range_sorted(self.key, since, until or time.time(), limit)
+        return [StatementItem.model_validate_json(value) for value in values]
+
+    @staticmethod
+    async def forget_chat(chat_id: int) -> list[str]:
+        """
+        Asynchronously drops the list of the accounts synced by a chat.
+
+        Args:
+            chat_id (int): The chat.
+
+        Returns:
+            list[str]: The ids of the accounts the chat has synced within the retention.
+        """
+
+        accounts = await RedisStorage().get_members(f"statement_accounts_{chat_id}")
+        await RedisStorage().forget(f"statement_accounts_{chat_id}")
+
+        return accounts
+
+    @staticmethod
+    async def forget(account: str) -> None:
+        """
+        Asynchronously drops the stored statement, its columns and the cursor of an account.
+
+        Args:
+            account (str): The account id.
+        """
+
+        keys = (
+            f"statement_{account}", f"statement_{account}_values",
+            f"statement_cursor_{account}", f"statement_columns_{account}"
+        )
+
+        for key in keys:
+            await RedisStorage().forget(key)
@@ -0,0 +1,39 @@
+from misc.statement import StatementSync
+
+
+class SpendingSummary:
+    metrics: dict = {
+        "days_aggregated": 0,
+        "items_aggregated": 0
+    }
+
+    def __init__(self, account: str) -> None:
+        """
+        Initializes a SpendingSummary instance for an account.
+
+        Args:
+            account (str): The account id.
+        """
+
+        self.account = account
+
+    async def partials(self, starts: list[int]) -> list[dict]:
+        """
+        Asynchronously aggregates the stored statement of the account per day.
+
+        Every day is aggregated from the columns StatementSync lays its items out in when storing them,
+        so no statement item is decoded here.
+
+        Args:
+            starts (list[int]): The start of every day followed by the end of the last one, see day_starts.
+
+        Returns:
+            list[dict]: The aggregate of every day, see DayColumns.aggregate.
+        """
+
+        columns = await StatementSync("", self.account).columns(starts)
+
+        self.metrics["days_aggregated"] += len(columns)
+        self.metrics["items_aggregated"] += sum(len(day) for day in columns)
+
+        return [day.aggregate() for day in columns]
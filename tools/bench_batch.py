@@ -0,0 +1,86 @@
+"""
+Compares rendering every account of a client in one render_batch job, as the prefetch does,
+with one render job per account.
+
+The render executor is configured from the environment, e.g. RENDER_EXECUTOR=process.
+
+Run from the repository root:
+    python -m tools.bench_batch [rounds]
+"""
+
+import sys
+import asyncio
+
+from time import perf_counter
+
+from misc.image import ImagePack, ImageCache, FontRegistry, GlyphAtlas
+from misc.executor import RenderExecutor
+
+from actions.client import AccountImage
+
+from tools import fixtures
+
+
+def client():
+    """
+    Builds a client with every renderable card, black cards in every currency.
+    """
+
+    accounts = [
+        fixtures.account_payload("black", currency, credit_limit=500000)
+        for currency in fixtures.CURRENCIES
+    ]
+    accounts += [
+        fixtures.account_payload(account_type)
+        for account_type in fixtures.renderable_types() if account_type != "black"
+    ]
+
+    return fixtures.client(accounts)
+
+
+def reset() -> None:
+    """
+    Drops rendered cards and images, so every round renders from the templates.
+    """
+
+    AccountImage.cards.clear()
+    AccountImage.renders.clear()
+
+
+async def single(model, labels: dict) -> None:
+    for account in model.accounts:
+        await AccountImage(account, model.name, labels).result()
+
+
+async def batch(model, labels: dict) -> None:
+    await AccountImage.render_batch([AccountImage(account, model.name, labels) for account in model.accounts])
+
+
+async def main(rounds: int) -> None:
+    ImagePack().update()
+    ImageCache().load()
+    FontRegistry().load()
+    GlyphAtlas.load()
+    AccountImage.precompose()
+    RenderExecutor().create()
+
+    model, labels = client(), fixtures.captions()
+    print("%s executor, %d accounts per client\n" % (RenderExecutor().kind, len(model.accounts)))
+
+    for name, render in (("single", single), ("batch", batch)):
+        await render(model, labels)  # warm up the workers
+
+        elapsed = 0.0
+        for _ in range(rounds):
+            reset()
+            start = perf_counter()
+            await render(model, labels)
+            elapsed += perf_counter() - start
+
+        print("%-8s %10.1f ms per client" % (name, elapsed / rounds * 1000))
+
+    RenderExecutor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
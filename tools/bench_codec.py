@@ -0,0 +1,85 @@
+"""
+Benchmarks the JSON paths of the client info and reports the results as JSON.
+
+The payload is a realistic client info with an account of every type in every currency, as the upstream
+sends it. Three paths are measured, each with the standard library next to the configured codec:
+"upstream" decodes a response body, "cached" turns a stored blob back into a model and "store" encodes
+a model for the storage.
+
+Run from the repository root:
+    python -m tools.bench_codec [rounds] > bench.json
+"""
+
+import sys
+import json
+import platform
+
+from time import perf_counter
+from typing import Callable
+
+import pydantic
+
+from misc.codec import Codec
+from misc.models.client_info import Model
+
+from tools import fixtures
+from tools.bench_render import percentiles
+
+
+def payload() -> bytes:
+    accounts = [
+        fixtures.account_payload(account_type, currency, balance=1234567 + i * 1111, credit_limit=500000)
+        for i, (account_type, currency) in enumerate(
+            (t, c) for t in fixtures.ACCOUNT_TYPES for c in fixtures.CURRENCIES
+        )
+    ]
+
+    client = fixtures.client_payload(accounts, name="Іван Петренко")
+    return json.dumps(client, ensure_ascii=False).encode("utf-8")
+
+
+def measure(case: str, call: Callable, rounds: int, size: int) -> dict:
+    call()
+
+    timings = []
+    for _ in range(rounds):
+        start = perf_counter()
+        call()
+        timings.append((perf_counter() - start) * 1e6)
+
+    return {
+        "case": case,
+        "bytes": size,
+        "us": {k: round(v, 2) for k, v in percentiles(timings).items()}
+    }
+
+
+def main(rounds: int) -> None:
+    raw = payload()
+    model = Model(**json.loads(raw))
+    blob = model.model_dump_json()
+
+    results = [
+        measure("upstream/json.loads", lambda: json.loads(raw), rounds, len(raw)),
+        measure("upstream/codec.loads", lambda: Codec.loads(raw), rounds, len(raw)),
+        measure("cached/Model(**json.loads)", lambda: Model(**json.loads(blob)), rounds, len(blob)),
+        measure("cached/Model.model_validate_json", lambda: Model.model_validate_json(blob), rounds, len(blob)),
+        measure("store/json.dumps(model_dump)", lambda: json.dumps(model.model_dump(mode="json")), rounds, len(blob)),
+        measure("store/model_dump_json", model.model_dump_json, rounds, len(blob))
+    ]
+
+    json.dump({
+        "environment": {
+            "python": platform.python_version(),
+            "pydantic": pydantic.VERSION,
+            "codec": Codec.name,
+            "accounts": len(model.accounts)
+        },
+        "rounds": rounds,
+        "results": results
+    }, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,50 @@
+"""
+Reports encode time and output size of the account image for every card type and encoder setting.
+
+Run from the repository root:
+    python -m tools.bench_encode [rounds]
+"""
+
+import sys
+
+from time import perf_counter
+
+from misc.image import ImageCache, FontRegistry, ImageEncoder
+
+from actions.client import AccountImage
+
+from tools import fixtures
+
+
+ENCODERS: tuple = (
+    ImageEncoder("PNG", compress_level=1),
+    ImageEncoder("PNG", compress_level=6),
+    ImageEncoder("PNG", compress_level=9),
+    ImageEncoder("PNG", compress_level=6, optimize=True),
+    ImageEncoder("WEBP", quality=80, compress_level=4),
+    ImageEncoder("WEBP", quality=90, compress_level=4),
+    ImageEncoder("JPEG", quality=85, optimize=False),
+    ImageEncoder("JPEG", quality=95, optimize=True),
+)
+
+
+def main(rounds: int) -> None:
+    ImageCache().load()
+    FontRegistry().load()
+
+    print("%-12s %-48s %10s %10s" % ("card", "encoder", "ms", "KiB"))
+    for account_type in fixtures.renderable_types():
+        account = fixtures.account(account_type, credit_limit=500000)
+        image = AccountImage(account, "Ivan Petrenko", fixtures.captions()).draw().source
+
+        for encoder in ENCODERS:
+            start = perf_counter()
+            for _ in range(rounds):
+                size = len(encoder.encode(image))
+
+            elapsed = (perf_counter() - start) / rounds * 1000
+            print("%-12s %-48s %10.2f %10.1f" % (account_type, encoder, elapsed, size / 1024))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
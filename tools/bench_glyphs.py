@@ -0,0 +1,101 @@
+"""
+Compares FreeType rasterization with the glyph atlas for the balance and credit limit lines.
+
+Run from the repository root:
+    python -m tools.bench_glyphs [rounds]
+"""
+
+import sys
+
+from time import perf_counter
+
+from PIL import ImageDraw, ImageChops
+
+from misc.image import ImageCache, FontRegistry, GlyphAtlas
+
+from actions.client import AccountImage
+
+from tools import fixtures
+
+
+# text drawn by AccountImage.draw: name, face, size, position
+LINES: tuple = (
+    ("balance", "Montserrat-SemiBold.ttf", 120, "center"),
+    ("credit limit", "Montserrat-Regular.ttf", 23, (695, 225)),
+)
+
+AMOUNTS: tuple = (0, 99, 1234567, -500000, 987654321)
+
+
+def freetype(image, font: str, size: int, pos, text: str) -> None:
+    """
+    Draws the text the way ImageProcess.add_text does without an atlas.
+    """
+
+    draw = ImageDraw.Draw(image)
+    font = FontRegistry().get(font, size)
+
+    if pos == "center":
+        _, _, w_tb, _ = draw.textbbox((0, 0), text, font=font)
+        pos = ((image.width - w_tb) / 2, 45)
+
+    draw.text(pos, text, (255, 255, 255), font=font)
+
+
+def atlas(image, font: str, size: int, pos, text: str) -> None:
+    """
+    Draws the text from the glyph atlas.
+    """
+
+    glyphs = GlyphAtlas.get(font, size, text)
+
+    if pos == "center":
+        pos = ((image.width - glyphs.width(text)) / 2, 45)
+
+    glyphs.draw(image, pos, text, (255, 255, 255))
+
+
+def main(rounds: int) -> None:
+    ImageCache().load()
+    FontRegistry().load()
+
+    start = perf_counter()
+    GlyphAtlas.load()
+    print("atlas build: %.2f ms\n" % ((perf_counter() - start) * 1000))
+
+    background = ImageCache().get("UAH_background.png")
+    display = AccountImage(fixtures.account("black"), "", {}).int_display
+
+    print("%-14s %-20s %10s %10s %8s %8s" % ("line", "text", "freetype", "atlas", "speedup", "max diff"))
+    for name, font, size, pos in LINES:
+        for amount in AMOUNTS:
+            text = display(amount / 100, "UAH")
+            timings = []
+
+            for draw in (freetype, atlas):
+                start = perf_counter()
+                for _ in range(rounds):
+                    image = background.copy()
+                    draw(image, font, size, pos, text)
+
+                timings.append((perf_counter() - start) / rounds * 1000)
+
+            expected, result = background.copy(), background.copy()
+            freetype(expected, font, size, pos, text)
+            atlas(result, font, size, pos, text)
+            max_diff = max(high for _, high in ImageChops.difference(expected, result).getextrema())
+
+            # the background copy is the same in both columns, subtract it to compare the text alone
+            copy_start = perf_counter()
+            for _ in range(rounds):
+                background.copy()
+            copy_ms = (perf_counter() - copy_start) / rounds * 1000
+
+            ft_ms, atlas_ms = (t - copy_ms for t in timings)
+            print("%-14s %-20s %10.3f %10.3f %7.1fx %8d" % (
+                name, text, ft_ms, atlas_ms, ft_ms / max(atlas_ms, 1e-6), max_diff
+            ))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
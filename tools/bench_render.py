@@ -0,0 +1,189 @@
+"""
+Benchmarks the render paths over every account type, currency and language and reports the results as JSON.
+
+Every round starts with the card and QR frame caches cleared, so each sample is a cold render from the
+loaded templates. Account types that cannot be rendered are reported with their error instead of timings.
+
+Memory is reported twice: "peak_python_kib" is the tracemalloc peak, which does not see Pillow pixel
+buffers, and "peak_rss_kib" is the growth of the process peak resident set, which does but is only
+available on Linux, is blunted by memory the allocator kept from earlier cases and is clamped at 0.
+
+Run from the repository root:
+    python -m tools.bench_render [rounds] > bench.json
+"""
+
+import sys
+import json
+import platform
+import tracemalloc
+
+from time import perf_counter
+from typing import Callable
+
+import PIL
+
+from misc.lang import Lang
+from misc.other import Other
+from misc.image import ImageCache, FontRegistry, GlyphAtlas, ImageEncoder
+
+from actions.auth import QRImage
+from actions.client import AccountImage
+
+from tools import fixtures
+
+import config
+
+
+CLIENT_NAME = "Іван Петренко"
+
+
+def percentiles(values: list) -> dict:
+    """
+    Computes the nearest-rank percentiles of the samples.
+    """
+
+    ordered = sorted(values)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {"p50": pick(50), "p90": pick(90), "p99": pick(99), "max": ordered[-1]}
+
+
+def resident_peak() -> int | None:
+    """
+    Reads the peak resident set of the process in KiB, or None where /proc is not available.
+    """
+
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        return
+
+
+def reset_resident_peak() -> None:
+    """
+    Resets the peak resident set to the current one, so the next reading covers the case alone.
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def clear_caches() -> None:
+    AccountImage.cards.clear()
+    AccountImage.renders.clear()
+    QRImage.frames.clear()
+
+
+def measure(case: dict, func: Callable[[], bytes | object], rounds: int) -> dict:
+    """
+    Runs the render function cold for the given number of rounds and summarizes the samples.
+
+    Args:
+        case (dict): The fields identifying the case, copied into the result.
+        func (Callable[[], bytes | object]): The render function; the size is reported for bytes results.
+        rounds (int): The number of samples.
+
+    Returns:
+        dict: The case with its timings, memory peaks and output sizes, or with the error it raised.
+    """
+
+    timings, sizes = [], []
+
+    reset_resident_peak()
+    resident_before = resident_peak()
+    tracemalloc.start()
+
+    try:
+        for _ in range(rounds):
+            clear_caches()
+
+            start = perf_counter()
+            result = func()
+            timings.append((perf_counter() - start) * 1000)
+
+            if isinstance(result, bytes):
+                sizes.append(len(result))
+    except Exception as e:
+        return {**case, "error": "%s: %s" % (e.__class__.__name__, e)}
+    finally:
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    resident_after = resident_peak()
+
+    return {
+        **case,
+        "rounds": rounds,
+        "time_ms": {k: round(v, 3) for k, v in percentiles(timings).items()},
+        "peak_python_kib": round(python_peak / 1024, 1),
+        # the kernel updates the peak lazily, so a case that does not grow it can read slightly below the reset
+        "peak_rss_kib": None if resident_before is None else max(0, resident_after - resident_before),
+        "size_bytes": percentiles(sizes) if sizes else None
+    }
+
+
+def account_cases(rounds: int) -> list:
+    results = []
+
+    for language in Lang.dictionary["valid_lang_keys"]:
+        labels = fixtures.captions(language)
+        name = Other.name_translate(language, CLIENT_NAME)
+
+        for account_type in fixtures.ACCOUNT_TYPES:
+            for currency in fixtures.CURRENCIES:
+                account = fixtures.account(account_type, currency, credit_limit=500000)
+                case = {"type": account_type, "currency": currency, "language": language}
+
+                image = AccountImage(account, name, labels)
+                results.append(measure({"target": "AccountImage.build_image", **case}, image.build_image, rounds))
+
+                # The card does not depend on the language, it is measured once per type and currency
+                if language == Lang.default_lang:
+                    results.append(measure({"target": "AccountImage.card", **case}, lambda: image.card, rounds))
+
+    return results
+
+
+def qr_cases(rounds: int) -> list:
+    results = []
+
+    for token in ("roll-token", "roll-token-with-a-longer-link-preview"):
+        roll = fixtures.roll(token)
+        results.append(measure({"target": "QRImage.get", "url": roll.url}, QRImage(roll).get, rounds))
+
+    return results
+
+
+def main(rounds: int) -> None:
+    Lang().load()
+    ImageCache().load()
+    FontRegistry().load()
+    GlyphAtlas.load()
+    AccountImage.precompose()
+
+    results = account_cases(rounds) + qr_cases(rounds)
+
+    json.dump({
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+            "encoder": str(ImageEncoder()),
+            "qr_format": config.QR_IMAGE_FORMAT,
+            "image_pack": config.IMAGE_PACK
+        },
+        "rounds": rounds,
+        "errors": sum(1 for result in results if "error" in result),
+        "results": results
+    }, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,99 @@
+"""
+Compares the two-pass card transformation (perspective, then rotate) with the single composed pass.
+
+Run from the repository root:
+    python -m tools.bench_transform [rounds]
+"""
+
+import sys
+
+from time import perf_counter
+
+from PIL import Image, ImageChops, ImageStat
+
+from misc.image import ImageCache, ImageProcess
+
+
+CARDS = ("black", "white", "yellow", "eAid", "rebuilding", "atb")
+
+
+def two_pass(file: str) -> Image.Image:
+    """
+    Transforms the card the way AccountImage did before the transformations were composed.
+
+    Args:
+        file (str): The card template file name.
+
+    Returns:
+        Image.Image: The transformed card.
+    """
+
+    image = ImageCache().get(file)
+    width, height = image.size
+
+    image = image.transform(
+        (width + int(round(.3 * width)), height),
+        Image.AFFINE, (1, -.3, 0, 0, 1, 0), Image.BICUBIC
+    )
+    return image.rotate(10, resample=Image.BICUBIC, expand=True)
+
+
+def single_pass(file: str) -> Image.Image:
+    """
+    Transforms the card through the composed ImageProcess transformations.
+
+    Args:
+        file (str): The card template file name.
+
+    Returns:
+        Image.Image: The transformed card.
+    """
+
+    card = ImageProcess(file)
+    card.perspective(-.3)
+    card.rotate(10, expand=True)
+    return card.source
+
+
+def visible(image: Image.Image) -> Image.Image:
+    """
+    Composites the card on a gray background, so differences under transparent pixels are ignored.
+    """
+
+    background = Image.new("RGBA", image.size, (128, 128, 128, 255))
+    return Image.alpha_composite(background, image).convert("RGB")
+
+
+def measure(func, file: str, rounds: int) -> float:
+    """
+    Measures the average time of a transformation in milliseconds.
+    """
+
+    start = perf_counter()
+    for _ in range(rounds):
+        func(file)
+
+    return (perf_counter() - start) / rounds * 1000
+
+
+def main(rounds: int) -> None:
+    ImageCache().load()
+
+    print("%-12s %10s %10s %8s %10s %8s" % ("card", "old ms", "new ms", "speedup", "mean diff", "max diff"))
+    for name in CARDS:
+        file = f"{name}-card.png"
+
+        old, new = two_pass(file), single_pass(file)
+        if old.size != new.size:
+            raise AssertionError(f"{name}: size mismatch {old.size} != {new.size}")
+
+        difference = ImageChops.difference(visible(old), visible(new))
+        mean_diff = sum(ImageStat.Stat(difference).mean) / 3
+        max_diff = max(high for _, high in difference.getextrema())
+
+        old_ms, new_ms = measure(two_pass, file, rounds), measure(single_pass, file, rounds)
+        print("%-12s %10.2f %10.2f %7.2fx %10.3f %8d" % (name, old_ms, new_ms, old_ms / new_ms, mean_diff, max_diff))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
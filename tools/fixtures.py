@@ -0,0 +1,235 @@
+"""
+Synthetic client info used by the benchmarks and local tools.
+
+The payloads follow the upstream JSON shapes, so they go through the same validators as real responses.
+"""
+
+import io
+import os
+import base64
+import random
+import typing
+import zlib
+
+from PIL import Image
+
+from misc.lang import Lang
+from misc.image import ImageCache
+
+from misc.models.client_info import Model as ClientModel
+from misc.models.client_info import Account as AccountModel
+from misc.models.roll_in import Model as RollModel
+
+from actions.client import AccountImage
+
+
+ACCOUNT_TYPES: tuple = typing.get_args(AccountModel.model_fields["type"].annotation)
+CURRENCIES: dict = {"UAH": 980, "USD": 840, "EUR": 978}
+
+PANS: dict = {
+    "VISA": "437541******1234",
+    "MASTERCARD": "537541******1234"
+}
+
+
+def renderable_types() -> tuple:
+    """
+    Lists the account types that have both a card and a background template to render.
+
+    Returns:
+        tuple: The account types in their declaration order.
+    """
+
+    path = ImageCache().path
+    return tuple(
+        t for t in ACCOUNT_TYPES
+        if os.path.exists(os.path.join(path, f"{t}-card.png"))
+        and os.path.exists(os.path.join(path, AccountImage(account(t), "", {}).background))
+    )
+
+
+def account_payload(
+        account_type: str,
+        currency: str = "UAH",
+        balance: int = 1234567,
+        credit_limit: int = 0,
+        card_system: str = "MASTERCARD"
+) -> dict:
+    """
+    Builds an upstream account object.
+
+    Args:
+        account_type (str): The account type.
+        currency (str, optional): The currency code. Defaults to "UAH".
+        balance (int, optional): The balance in minor units. Defaults to 1234567.
+        credit_limit (int, optional): The credit limit in minor units. Defaults to 0.
+        card_system (str, optional): The card system of the masked number. Defaults to "MASTERCARD".
+
+    Returns:
+        dict: The account object.
+    """
+
+    return {
+        "id": f"{account_type}-{currency}",
+        "sendId": f"send-{account_type}",
+        "currencyCode": CURRENCIES[currency],
+        "cashbackType": "UAH",
+        "balance": balance,
+        "creditLimit": credit_limit,
+        "maskedPan": [PANS[card_system]],
+        "type": account_type,
+        "iban": "UA000000000000000000000000000"
+    }
+
+
+def client_payload(accounts: list[dict] = None, name: str = "Ivan Petrenko") -> dict:
+    """
+    Builds an upstream client info object, with a black card in every currency by default.
+
+    Args:
+        accounts (list[dict], optional): The account objects.
+        name (str, optional): The client name. Defaults to "Ivan Petrenko".
+
+    Returns:
+        dict: The client info object.
+    """
+
+    if accounts is None:
+        accounts = [account_payload("black", currency, credit_limit=500000) for currency in CURRENCIES]
+
+    return {
+        "clientId": "3MSaMMtczs",
+        "name": name,
+        "webHookUrl": "",
+        "permissions": "psfj",
+        "accounts": accounts
+    }
+
+
+def account(*args, **kwargs) -> AccountModel:
+    """
+    Builds a validated account, see account_payload.
+
+    Returns:
+        AccountModel: The account.
+    """
+
+    return AccountModel(**account_payload(*args, **kwargs))
+
+
+def client(*args, **kwargs) -> ClientModel:
+    """
+    Builds a validated client info, see client_payload.
+
+    Returns:
+        ClientModel: The client info.
+    """
+
+    return ClientModel(**client_payload(*args, **kwargs))
+
+
+def captions(language: str = Lang.default_lang) -> dict:
+    """
+    Collects the account image captions for the language from the loaded language data.
+
+    Args:
+        language (str, optional): The language code. Defaults to the default language.
+
+    Returns:
+        dict: The captions keyed by language key.
+    """
+
+    if not Lang.dictionary:
+        Lang().load()
+
+    return {key: Lang.dictionary["keys"][key][language] for key in ("own_funds", "credit_limit",)}
+
+
+def qr_code(size: int = 220, modules: int = 33, seed: int = 0) -> str:
+    """
+    Draws a QR-like black and white module grid and encodes it like the upstream roll-in response.
+
+    Args:
+        size (int, optional): The side of the image in pixels. Defaults to 220.
+        modules (int, optional): The number of modules per side. Defaults to 33.
+        seed (int, optional): The seed of the module pattern. Defaults to 0.
+
+    Returns:
+        str: The base64 encoded PNG.
+    """
+
+    generator = random.Random(seed)
+    grid = Image.new("1", (modules, modules), 1)
+    grid.putdata([generator.random() < .5 for _ in range(modules * modules)])
+
+    buffered = io.BytesIO()
+    grid.resize((size, size), Image.NEAREST).save(buffered, format="PNG")
+
+    return base64.b64encode(buffered.getvalue()).decode("ascii")
+
+
+def roll_payload(token: str = "roll-token", host: str = "mbnk.app") -> dict:
+    """
+    Builds an upstream roll-in object.
+
+    Args:
+        token (str, optional): The roll-in token. Defaults to "roll-token".
+        host (str, optional): The host of the authorization link. Defaults to "mbnk.app".
+
+    Returns:
+        dict: The roll-in object.
+    """
+
+    return {
+        "token": token,
+        "requestId": f"request-{token}",
+        "url": f"https://{host}/auth/{token}",
+        "qr": qr_code(seed=zlib.crc32(token.encode()))
+    }
+
+
+def roll(*args, **kwargs) -> RollModel:
+    """
+    Builds a validated roll-in, see roll_payload.
+
+    Returns:
+        RollModel: The roll-in.
+    """
+
+    return RollModel(**roll_payload(*args, **kwargs))
+
+
+def statement_payload(account_id: str, amount: int = -12345, balance: int = 1222222, seed: int = 0) -> dict:
+    """
+    Builds an upstream statement webhook event.
+
+    Args:
+        account_id (str): The account of the statement item.
+        amount (int, optional): The amount in minor units. Defaults to -12345.
+        balance (int, optional): The balance after the statement item in minor units. Defaults to 1222222.
+        seed (int, optional): Makes the statement item id unique. Defaults to 0.
+
+    Returns:
+        dict: The webhook event.
+    """
+
+    return {
+        "type": "StatementItem",
+        "data": {
+            "account": account_id,
+            "statementItem": {
+                "id": f"statement-{account_id}-{seed}",
+                "time": 1700000000 + seed,
+                "description": "Coffee",
+                "mcc": 5814,
+                "originalMcc": 5814,
+                "hold": False,
+                "amount": amount,
+                "operationAmount": amount,
+                "currencyCode": 980,
+                "commissionRate": 0,
+                "cashbackAmount": 0,
+                "balance": balance
+            }
+        }
+    }
@@ -0,0 +1,254 @@
+"""
+Local stand-in for the Mono API, for load and latency testing without the real service.
+
+Implements check-proto, roll-in, exchange-token and request/personal/client-info with the response shapes
+of misc/models. A roll-in token is pending until it is authorized, either automatically after
+--authorize-after seconds or by requesting /_authorize/<token>, and can then be exchanged once for
+a personal token. /_stats reports the request counters.
+
+Latency is drawn per request from a distribution, globally or per endpoint:
+    fixed:<ms>, uniform:<low ms>:<high ms>, normal:<mean ms>:<sd ms> or lognormal:<median ms>:<sigma>
+
+Run from the repository root and point the bot at it:
+    python -m tools.mono_server --port 8080 --latency lognormal:80:0.5 --latency client-info=uniform:200:600
+    MONO_API_URL=http://127.0.0.1:8080 python bot.py
+"""
+
+import uuid
+import random
+import asyncio
+import argparse
+
+from time import monotonic
+
+from aiohttp import web
+
+from misc.models.check_proto import Model as CheckProtoModel
+
+from tools import fixtures
+
+
+ENDPOINTS: tuple = ("check-proto", "roll-in", "exchange-token", "client-info")
+
+
+def latency(spec: str):
+    """
+    Parses a latency distribution.
+
+    Args:
+        spec (str): The distribution, see the module documentation.
+
+    Returns:
+        Callable[[], float]: Draws a latency in seconds.
+    """
+
+    kind, *params = spec.split(":")
+    params = [float(param) for param in params]
+
+    draw = {
+        "fixed": lambda: params[0],
+        "uniform": lambda: random.uniform(params[0], params[1]),
+        "normal": lambda: random.gauss(params[0], params[1]),
+        "lognormal": lambda: random.lognormvariate(0, params[1]) * params[0]
+    }[kind]
+
+    return lambda: max(0., draw()) / 1000
+
+
+class MonoStandIn:
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        """
+        Initializes a MonoStandIn instance from the command line options.
+
+        Args:
+            args (argparse.Namespace): The parsed command line options.
+        """
+
+        self.args = args
+
+        self.latency: dict = {endpoint: latency("fixed:0") for endpoint in ENDPOINTS}
+        for spec in args.latency:
+            endpoint, _, distribution = spec.rpartition("=")
+            for name in ((endpoint,) if endpoint else ENDPOINTS):
+                self.latency[name] = latency(distribution)
+
+        # roll-in token -> {"state": "pending" | "authorized" | "exchanged", "created": float}
+        self.rolls: dict = {}
+        self.personal_tokens: set = set()
+        self.token_calls: dict = {}
+
+        self.counters: dict = {endpoint: {"requests": 0, "errors": 0, "throttled": 0} for endpoint in ENDPOINTS}
+
+    def application(self) -> web.Application:
+        app = web.Application(middlewares=[self.faults])
+
+        app.router.add_get("/check-proto", self.check_proto)
+        app.router.add_get("/roll-in", self.roll_in)
+        app.router.add_post("/exchange-token", self.exchange_token)
+        app.router.add_get("/request/personal/client-info", self.client_info)
+
+        app.router.add_get("/_authorize/{token}", self.authorize)
+        app.router.add_get("/_stats", self.stats)
+
+        return app
+
+    @web.middleware
+    async def faults(self, request: web.Request, handler) -> web.StreamResponse:
+        """
+        Delays every API request and injects the configured server errors and 429 responses.
+        """
+
+        endpoint = request.path.rsplit("/", 1)[-1]
+        if endpoint not in self.counters:
+            return await handler(request)
+
+        counters = self.counters[endpoint]
+        counters["requests"] += 1
+
+        await asyncio.sleep(self.latency[endpoint]())
+
+        if random.random() < self.args.error_rate:
+            counters["errors"] += 1
+            return web.json_response({"errorDescription": "Internal error"}, status=500)
+
+        if random.random() < self.args.throttle_rate or self.over_limit(request.headers.get("X-Request-Id")):
+            counters["throttled"] += 1
+            return web.json_response(
+                {"errorDescription": "Too many requests"}, status=429,
+                headers={"Retry-After": str(self.args.retry_after)}
+            )
+
+        return await handler(request)
+
+    def over_limit(self, token: str | None) -> bool:
+        """
+        Counts a call of the token and checks it against the per-token limit, a sliding window of calls.
+        """
+
+        if not token or not self.args.token_limit:
+            return False
+
+        calls, period = self.args.token_limit
+        now = monotonic()
+
+        window = [t for t in self.token_calls.get(token, ()) if now - t < period]
+        if len(window) >= calls:
+            self.token_calls[token] = window
+            return True
+
+        self.token_calls[token] = window + [now]
+        return False
+
+    def roll_state(self, token: str) -> str | None:
+        """
+        Advances the roll-in token through its states and returns the current one, None if unknown or expired.
+        """
+
+        roll = self.rolls.get(token)
+        if not roll:
+            return
+
+        age = monotonic() - roll["created"]
+        if age > self.args.roll_ttl:
+            del self.rolls[token]
+            return
+
+        if roll["state"] == "pending" and self.args.authorize_after is not None and age >= self.args.authorize_after:
+            roll["state"] = "authorized"
+
+        return roll["state"]
+
+    async def check_proto(self, _: web.Request) -> web.Response:
+        return web.json_response(CheckProtoModel(**{
+            "proto": {"version": 1, "patch": 0},
+            "implementation": {"name": "monogram stand-in", "author": "monogram", "homepage": "http://localhost"},
+            "server": {"push": {"api": "none", "cert": "", "name": "stand-in"}}
+        }).model_dump())
+
+    async def roll_in(self, _: web.Request) -> web.Response:
+        token = uuid.uuid4().hex
+        self.rolls[token] = {"state": "pending", "created": monotonic()}
+
+        return web.json_response(fixtures.roll_payload(token))
+
+    async def exchange_token(self, request: web.Request) -> web.Response:
+        """
+        Exchanges an authorized roll-in token for a personal token, holding the request open for up to
+        --exchange-hold seconds while the token is pending.
+        """
+
+        token = (await request.post()).get("token", "")
+        deadline = monotonic() + self.args.exchange_hold
+
+        while (state := self.roll_state(token)) == "pending" and monotonic() < deadline:
+            await asyncio.sleep(.1)
+
+        if state is None or state == "exchanged":
+            return web.json_response({"error": "Invalid token"}, status=400)
+
+        if state == "pending":
+            return web.json_response({"token": False, "error": "Not authorized yet"})
+
+        self.rolls[token]["state"] = "exchanged"
+
+        personal_token = uuid.uuid4().hex
+        self.personal_tokens.add(personal_token)
+        return web.json_response({"token": personal_token})
+
+    async def client_info(self, request: web.Request) -> web.Response:
+        token = request.headers.get("X-Request-Id", "")
+        if token not in self.personal_tokens and not (self.args.accept_any_token and token):
+            return web.json_response({"errorDescription": "Unknown 'X-Token'"}, status=401)
+
+        return web.json_response(fixtures.client_payload(name=self.args.client_name))
+
+    async def authorize(self, request: web.Request) -> web.Response:
+        token = request.match_info["token"]
+        if self.roll_state(token) != "pending":
+            return web.json_response({"error": "Invalid token"}, status=404)
+
+        self.rolls[token]["state"] = "authorized"
+        return web.json_response({"state": "authorized"})
+
+    async def stats(self, _: web.Request) -> web.Response:
+        states = [self.roll_state(token) for token in list(self.rolls)]
+
+        return web.json_response({
+            "endpoints": self.counters,
+            "rolls": {state: states.count(state) for state in ("pending", "authorized", "exchanged")},
+            "personal_tokens": len(self.personal_tokens)
+        })
+
+
+def token_limit(spec: str) -> tuple:
+    calls, period = spec.split("/")
+    return int(calls), float(period)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Mono API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", action="append", default=[], metavar="[ENDPOINT=]DISTRIBUTION",
+                        help="latency distribution, for every endpoint or one of %s" % ", ".join(ENDPOINTS))
+    parser.add_argument("--error-rate", type=float, default=0., help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0., help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After of 429 responses, in seconds")
+    parser.add_argument("--token-limit", type=token_limit, default=None, metavar="CALLS/SECONDS",
+                        help="calls allowed per token within the period before answering with 429")
+    parser.add_argument("--authorize-after", type=float, default=None,
+                        help="seconds after which roll-in tokens authorize themselves; never by default")
+    parser.add_argument("--roll-ttl", type=float, default=300., help="seconds a roll-in token stays valid")
+    parser.add_argument("--exchange-hold", type=float, default=0.,
+                        help="seconds exchange-token waits for a pending token to be authorized")
+    parser.add_argument("--accept-any-token", action="store_true",
+                        help="serve client-info for any token, not only the exchanged ones")
+    parser.add_argument("--client-name", default="Іван Петренко")
+
+    args = parser.parse_args()
+    web.run_app(MonoStandIn(args).application(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Replays statement webhook events against the webhook receiver, for testing it offline.
+
+Events are read one JSON object per line from the given files, or from stdin with "-". Without files,
+synthetic events are generated for the given accounts, lowering the balance with every event.
+The answer statuses and latency percentiles are printed at the end.
+
+Run from the repository root against a bot started with WEBHOOK_ENABLED=true and the same WEBHOOK_PATH:
+    python -m tools.replay_webhook --account black-UAH --count 20 --rate 5
+    python -m tools.replay_webhook captured.jsonl --url http://127.0.0.1:8081/mono/<secret>
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+
+from time import perf_counter
+from collections import Counter
+
+import aiohttp
+
+from tools import fixtures
+
+import config
+
+
+def read_events(files: list[str]) -> list[dict]:
+    events = []
+
+    for file in files:
+        stream = sys.stdin if file == "-" else open(file, encoding="utf-8")
+        with stream:
+            events.extend(json.loads(line) for line in stream if line.strip())
+
+    return events
+
+
+def synthetic_events(accounts: list[str], count: int, balance: int, amount: int) -> list[dict]:
+    return [
+        fixtures.statement_payload(account, amount, balance + amount * (i + 1), seed=i)
+        for i in range(count) for account in accounts
+    ]
+
+
+async def replay(url: str, events: list[dict], rate: float) -> None:
+    statuses, latencies = Counter(), []
+
+    async with aiohttp.ClientSession() as session:
+        for event in events:
+            start = perf_counter()
+            try:
+                async with session.post(url, json=event) as response:
+                    statuses[response.status] += 1
+            except aiohttp.ClientError as e:
+                statuses[e.__class__.__name__] += 1
+            latencies.append((perf_counter() - start) * 1000)
+
+            if rate:
+                await asyncio.sleep(1 / rate)
+
+    latencies.sort()
+    pick = lambda p: latencies[min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))]
+
+    print("events %d, statuses %s" % (len(events), dict(statuses)))
+    if latencies:
+        print("latency ms p50 %.2f, p90 %.2f, p99 %.2f, max %.2f" % (pick(50), pick(90), pick(99), latencies[-1]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replays statement webhook events against the receiver.")
+    parser.add_argument("files", nargs="*", help="files with one event per line, - for stdin")
+    parser.add_argument("--url", help="receiver URL, defaults to the local one when WEBHOOK_PATH is set")
+    parser.add_argument("--account", action="append", default=[], help="account of the synthetic events")
+    parser.add_argument("--count", type=int, default=10, help="synthetic events per account")
+    parser.add_argument("--balance", type=int, default=1234567, help="starting balance in minor units")
+    parser.add_argument("--amount", type=int, default=-12345, help="amount of every event in minor units")
+    parser.add_argument("--rate", type=float, default=0., help="events per second, unlimited by default")
+
+    args = parser.parse_args()
+
+    if not args.url and not config.WEBHOOK_PATH:
+        parser.error("--url is required when WEBHOOK_PATH is not set")
+    url = args.url or "http://127.0.0.1:%d%s" % (config.WEBHOOK_PORT, config.WEBHOOK_PATH)
+
+    if args.files:
+        events = read_events(args.files)
+    else:
+        events = synthetic_events(args.account or ["black-UAH"], args.count, args.balance, args.amount)
+
+    asyncio.run(replay(url, events, args.rate))
+
+
+if __name__ == "__main__":
+    main()